@@ -8,13 +8,6 @@ sys.path.insert(0, '.')  # noqa
 
 import argparse
 
-from clay.core import meta, settings_manager
-from clay.playback.player import get_player
-import clay.ui.urwid as urwid
-
-
-player = get_player()  # pylint: disable=invalid-name
-
 
 class MultilineVersionAction(argparse.Action):
     """
@@ -29,13 +22,21 @@ class MultilineVersionAction(argparse.Action):
         super(MultilineVersionAction, self).__init__(option_strings, dest, nargs=0, **kwargs)
 
     def __call__(self, parser, namespace, values, option_string=None):
+        from clay.core import meta
         parser.exit(message=meta.COPYRIGHT_MESSAGE)
 
 
 def main():
     """
     Starts the main clay process
+
+    Clay is imported here rather than at the top of this module, because worker processes
+    import this module again and must not start the player or connect to D-Bus.
     """
+    from clay.core import meta
+    from clay.playback.player import get_player
+    import clay.ui.urwid as urwid
+
     try:
         from setproctitle import setproctitle
     except ImportError:
@@ -56,6 +57,7 @@ def main():
     if args.version:
         exit(0)
 
+    get_player()
     urwid.main()
 
 
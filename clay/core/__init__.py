@@ -2,5 +2,8 @@ from .eventhook import EventHook
 from .gp import gp
 from .log import logger
 from .settings import settings_manager
+from .cache import cache_manager
+from .download import download_manager
+from .art import art_manager
 from .osd import osd_manager
 from .mpris2 import mpris2_manager
@@ -0,0 +1,142 @@
+"""
+Artist art downloads & thumbnails.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from threading import Lock
+import multiprocessing
+
+from clay import thumbnail
+from clay.core.cache import cache_manager
+from clay.core.download import download_manager
+from clay.core.log import logger
+
+
+class _ArtManager(object):
+    """
+    Fetches artist art into cache off the caller's thread.
+
+    Downloads run in a small dedicated pool, so they never wait behind
+    Google Play Music requests, and concurrent requests for the same file share
+    one download. Thumbnails are made in a process pool.
+    Recent thumbnails are kept in memory, so files evicted from cache
+    are written back without downloading them again.
+    """
+    MAX_DOWNLOADS = 4
+    MAX_THUMBNAILERS = 2
+    THUMBNAIL_SIZE = (128, 128)
+    RECENT_COUNT = 32
+
+    def __init__(self):
+        self._downloader = ThreadPoolExecutor(max_workers=self.MAX_DOWNLOADS)
+        self._thumbnailer = None
+        self._lock = Lock()
+        self._pending = {}
+        # filename -> thumbnail data, ordered from least to most recently used
+        self._recent = OrderedDict()
+
+    def _get_thumbnailer(self):
+        """
+        Return process pool for thumbnails, created on first use.
+
+        Workers are spawned rather than forked, since forking a process
+        with many threads can leave locks held in the child.
+        They import :mod:`clay.thumbnail` and the main module, which must be safe to import.
+        """
+        with self._lock:
+            if self._thumbnailer is None:
+                self._thumbnailer = ProcessPoolExecutor(
+                    max_workers=self.MAX_THUMBNAILERS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._thumbnailer
+
+    def _get_recent(self, filename):
+        """
+        Return thumbnail data from memory or ``None``.
+        """
+        with self._lock:
+            data = self._recent.get(filename)
+            if data is not None:
+                self._recent.move_to_end(filename)
+            return data
+
+    def _add_recent(self, filename, data):
+        """
+        Keep thumbnail data in memory, forgetting the least recently used ones.
+        """
+        with self._lock:
+            self._recent[filename] = data
+            self._recent.move_to_end(filename)
+            while len(self._recent) > self.RECENT_COUNT:
+                self._recent.popitem(last=False)
+
+    def _fetch(self, url, filename):
+        """
+        Download & thumbnail art into cache, return its path.
+        """
+        data = self._get_recent(filename)
+        if data is None:
+            data = download_manager.get(url)
+            if thumbnail.Image is not None:
+                try:
+                    data = self._get_thumbnailer().submit(
+                        thumbnail.make_thumbnail, data, self.THUMBNAIL_SIZE
+                    ).result()
+                except Exception as error:  # pylint: disable=broad-except
+                    logger.warn('Failed to make thumbnail for {}: {}'.format(url, error))
+            self._add_recent(filename, data)
+        return cache_manager.save_file_to_cache(filename, data)
+
+    def _fetch_done(self, filename, future):
+        """
+        Forget finished download.
+        """
+        with self._lock:
+            if self._pending.get(filename) is future:
+                del self._pending[filename]
+
+    def get_cached_art(self, filename):
+        """
+        Return path to cached art or ``None`` if it is not fetched yet.
+        """
+        return cache_manager.get_cached_file_path(filename)
+
+    def get_art_async(self, url, filename, callback=None):
+        """
+        Return :class:`concurrent.futures.Future` of path to art at *url* cached as *filename*.
+
+        *callback*, if any, is called with two args: path and error,
+        same as for :func:`clay.core.gp.utils.asynchronous`.
+        """
+        path = self.get_cached_art(filename)
+        if path is not None:
+            future = Future()
+            future.set_result(path)
+        else:
+            with self._lock:
+                future = self._pending.get(filename)
+                is_new = future is None
+                if is_new:
+                    future = self._downloader.submit(self._fetch, url, filename)
+                    self._pending[filename] = future
+            if is_new:
+                future.add_done_callback(lambda f: self._fetch_done(filename, f))
+
+        if callback is not None:
+            future.add_done_callback(lambda f: self._notify(callback, f))
+        return future
+
+    @staticmethod
+    def _notify(callback, future):
+        """
+        Call *callback* with result of *future*, logging errors it raises.
+        """
+        error = future.exception()
+        try:
+            callback(None if error else future.result(), error)
+        except Exception as callback_error:  # pylint: disable=broad-except
+            logger.error('Art callback failed: {}'.format(repr(callback_error)))
+
+
+art_manager = _ArtManager()  # pylint: disable=invalid-name
@@ -0,0 +1,350 @@
+"""
+Cache of downloaded tracks & artist art.
+"""
+from collections import OrderedDict
+from hashlib import sha1
+from threading import Lock
+import atexit
+import json
+import os
+import time
+
+from clay.core.settings import settings_manager
+from clay.core.log import logger
+
+
+class _CacheManager(object):
+    """
+    Keeps cached files within a size budget.
+
+    Files are evicted in least recently used order once the total size exceeds
+    the ``cache_size`` setting (in megabytes, ``0`` means unlimited).
+    Pinned files (e.g. liked songs) are never evicted.
+
+    Cached files are tracked in a manifest (filename, size, checksum, last access)
+    that is stored in the cache dir, so lookups don't list or probe the cache dir.
+    Only :meth:`get_cached_file_path` checks that the file it returns still exists.
+    Partial files of downloads in progress are listed there as well,
+    so the ones left by an interrupted run are removed on the next start.
+    """
+    PARTIAL_SUFFIX = '.part'
+    MANIFEST_FILENAME = 'manifest.json'
+    MANIFEST_VERSION = 1
+    CHECKSUM_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self):
+        self._cache_dir = settings_manager.get_cache_dir()
+        self._manifest_path = os.path.join(self._cache_dir, self.MANIFEST_FILENAME)
+        self._lock = Lock()
+        # Serializes manifest writes, so an older copy never replaces a newer one
+        self._save_lock = Lock()
+        # filename -> [size, checksum, last access], ordered from least to most recently used
+        self._files = None
+        self._size = 0
+        self._pinned = set()
+        self._partial_files = set()
+        self._dirty = False
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        atexit.register(self._save)
+
+    def _load(self):
+        """
+        Load manifest, or rebuild it from the cache dir if it is missing or unreadable.
+        Must be called with the lock held.
+        """
+        if self._files is not None:
+            return
+
+        manifest = self._read_manifest()
+        if manifest is None:
+            entries = self._scan()
+            self._dirty = True
+        else:
+            entries = manifest['files']
+            partial_files = manifest.get('partial', [])
+            if partial_files:
+                self._remove_partial_files(set(partial_files) - self._partial_files)
+                self._dirty = True
+
+        self._files = OrderedDict()
+        self._size = 0
+        for filename, size, checksum, last_access in sorted(entries, key=lambda e: e[3]):
+            self._files[filename] = [size, checksum, last_access]
+            self._size += size
+
+    def _read_manifest(self):
+        """
+        Return manifest or ``None`` if it can't be used.
+        """
+        try:
+            with open(self._manifest_path, 'r') as manifest_file:
+                manifest = json.load(manifest_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as error:
+            logger.warn('Failed to load cache manifest: {}'.format(error))
+            return None
+
+        if manifest.get('version') != self.MANIFEST_VERSION:
+            return None
+
+        return manifest
+
+    def _remove_partial_files(self, filenames):
+        """
+        Remove partial files of *filenames* left over from interrupted downloads.
+        """
+        for filename in filenames:
+            try:
+                os.remove(self.get_partial_file_path(filename))
+            except FileNotFoundError:
+                pass
+            except OSError as error:
+                logger.warn('Failed to remove partial {}: {}'.format(filename, error))
+
+    def _scan(self):
+        """
+        Build manifest entries from files in the cache dir.
+        Checksums of the existing files are not computed.
+        """
+        entries = []
+        for entry in os.scandir(self._cache_dir):
+            if not entry.is_file() or entry.name.endswith(self.PARTIAL_SUFFIX) or \
+               entry.name.startswith(self.MANIFEST_FILENAME):
+                continue
+            stat = entry.stat()
+            entries.append((entry.name, stat.st_size, None, stat.st_mtime))
+        return entries
+
+    def _save(self):
+        """
+        Write manifest to disk if it changed since the last write.
+
+        Entries are copied with the lock held and written without it,
+        so lookups don't wait for the disk.
+        """
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                files = [[filename] + entry for filename, entry in self._files.items()]
+                partial_files = list(self._partial_files)
+                self._dirty = False
+
+            try:
+                with open(self._manifest_path + '.tmp', 'w') as manifest_file:
+                    json.dump(dict(
+                        version=self.MANIFEST_VERSION, files=files, partial=partial_files
+                    ), manifest_file)
+                os.replace(self._manifest_path + '.tmp', self._manifest_path)
+            except OSError as error:
+                logger.error('Failed to save cache manifest: {}'.format(error))
+                with self._lock:
+                    self._dirty = True
+
+    def _get_checksum(self, path):
+        """
+        Return SHA1 of file at *path*.
+        """
+        checksum = sha1()
+        with open(path, 'rb') as cachefile:
+            for chunk in iter(lambda: cachefile.read(self.CHECKSUM_CHUNK_SIZE), b''):
+                checksum.update(chunk)
+        return checksum.hexdigest()
+
+    def _add(self, filename, checksum):
+        """
+        Register written *filename*, evict old files if needed and save manifest.
+        """
+        path = os.path.join(self._cache_dir, filename)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._load()
+            self._partial_files.discard(filename)
+            old_entry = self._files.pop(filename, None)
+            if old_entry is not None:
+                self._size -= old_entry[0]
+            self._files[filename] = [size, checksum, time.time()]
+            self._size += size
+            self._evict()
+            self._dirty = True
+        self._save()
+        return path
+
+    def _evict(self):
+        """
+        Remove least recently used files until cache fits into budget.
+        Must be called with the lock held.
+
+        The most recently used file is never evicted.
+        """
+        limit = self.get_size_limit()
+        if not limit or self._size <= limit:
+            return
+
+        for filename in list(self._files)[:-1]:
+            if self._size <= limit:
+                break
+            if filename in self._pinned:
+                continue
+
+            try:
+                os.remove(os.path.join(self._cache_dir, filename))
+            except FileNotFoundError:
+                pass
+            except OSError as error:
+                logger.warn('Failed to evict {}: {}'.format(filename, error))
+                continue
+
+            self._size -= self._files.pop(filename)[0]
+            self.evictions += 1
+
+    def get_size_limit(self):
+        """
+        Return cache budget in bytes or ``0`` if unlimited.
+        """
+        return int(settings_manager.get('cache_size', 'play_settings') or 0) * 1024 * 1024
+
+    def get_cached_file_path(self, filename):
+        """
+        Get full path to cached file and mark it as recently used.
+
+        Returns ``None`` if the file is not cached or was removed from the cache dir
+        outside of Clay, in which case it is dropped from the manifest.
+        """
+        path = os.path.join(self._cache_dir, filename)
+        with self._lock:
+            self._load()
+            entry = self._files.get(filename)
+            if entry is not None and not os.path.exists(path):
+                logger.warn('Cached file {} is missing'.format(filename))
+                self._size -= self._files.pop(filename)[0]
+                self._dirty = True
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+
+            entry[2] = time.time()
+            self._files.move_to_end(filename)
+            self._dirty = True
+            self.hits += 1
+        return path
+
+    def get_file_path(self, filename):
+        """
+        Get full path to *filename* in cache, e.g. once :meth:`get_is_file_cached` confirms it's there.
+
+        Unlike :meth:`get_cached_file_path`, it's not counted as a lookup
+        and doesn't mark the file as recently used.
+        """
+        return os.path.join(self._cache_dir, filename)
+
+    def get_is_file_cached(self, filename):
+        """
+        Return ``True`` if *filename* is present in cache.
+        """
+        with self._lock:
+            self._load()
+            return filename in self._files
+
+    def get_partial_file_path(self, filename):
+        """
+        Get full path to the partially written *filename*.
+        """
+        return os.path.join(self._cache_dir, filename + self.PARTIAL_SUFFIX)
+
+    def start_partial_file(self, filename):
+        """
+        Register partial file of *filename* that is about to be written and return its path.
+
+        Once complete, it is moved into cache with :meth:`commit_partial_file`,
+        otherwise it must be removed with :meth:`discard_partial_file`.
+        """
+        with self._lock:
+            self._load()
+            self._partial_files.add(filename)
+            self._dirty = True
+        self._save()
+        return self.get_partial_file_path(filename)
+
+    def discard_partial_file(self, filename):
+        """
+        Remove partial file of *filename*, e.g. once its download fails or is cancelled.
+        """
+        self._remove_partial_files([filename])
+        with self._lock:
+            if filename in self._partial_files:
+                self._partial_files.discard(filename)
+                self._dirty = True
+
+    def commit_partial_file(self, filename, checksum=None):
+        """
+        Atomically move completely written *filename* into cache and return its path.
+
+        *checksum* is SHA1 of the file computed while it was written,
+        the file is read to compute it if not given.
+        """
+        path = os.path.join(self._cache_dir, filename)
+        if checksum is None:
+            checksum = self._get_checksum(path + self.PARTIAL_SUFFIX)
+        os.replace(path + self.PARTIAL_SUFFIX, path)
+        return self._add(filename, checksum)
+
+    def save_file_to_cache(self, filename, content):
+        """
+        Save content into file in cache.
+        """
+        path = os.path.join(self._cache_dir, filename)
+        with open(path, 'wb') as cachefile:
+            cachefile.write(content)
+        return self._add(filename, sha1(content).hexdigest())
+
+    def get_checksum(self, filename):
+        """
+        Return SHA1 of cached *filename* as recorded when it was written,
+        ``None`` if unknown.
+        """
+        with self._lock:
+            self._load()
+            entry = self._files.get(filename)
+            return entry[1] if entry else None
+
+    def pin(self, filename):
+        """
+        Protect *filename* from eviction.
+        """
+        with self._lock:
+            self._pinned.add(filename)
+
+    def unpin(self, filename):
+        """
+        Allow *filename* to be evicted again.
+        """
+        with self._lock:
+            self._pinned.discard(filename)
+
+    def get_stats(self):
+        """
+        Return cache statistics.
+        """
+        with self._lock:
+            self._load()
+            lookups = self.hits + self.misses
+            return dict(
+                files=len(self._files),
+                size=self._size,
+                limit=self.get_size_limit(),
+                pinned=len(self._pinned),
+                hits=self.hits,
+                misses=self.misses,
+                hit_rate=self.hits / lookups if lookups else 0.0,
+                evictions=self.evictions
+            )
+
+
+cache_manager = _CacheManager()  # pylint: disable=invalid-name
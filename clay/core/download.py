@@ -0,0 +1,115 @@
+"""
+Shared HTTP connection pool for downloads.
+"""
+from threading import Lock
+
+import urllib3
+
+
+class DownloadError(OSError):
+    """
+    Raised when a download fails.
+    """
+
+
+class _DownloadManager(object):
+    """
+    Downloads files that don't go through gmusicapi, such as tracks & artist art.
+
+    Connections are kept alive per host and shared by all threads,
+    so consecutive downloads from the same host skip TCP & TLS handshakes.
+    Connection & read timeouts apply to every request, and failed connections
+    & server errors are retried with backoff.
+    """
+    MAX_HOSTS = 8
+    MAX_CONNECTIONS_PER_HOST = 4
+    CONNECT_TIMEOUT = 10
+    READ_TIMEOUT = 30
+    RETRIES = 2
+    RETRY_BACKOFF = 0.5
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self):
+        self._pool = urllib3.PoolManager(
+            num_pools=self.MAX_HOSTS,
+            maxsize=self.MAX_CONNECTIONS_PER_HOST,
+            timeout=urllib3.Timeout(connect=self.CONNECT_TIMEOUT, read=self.READ_TIMEOUT),
+            retries=urllib3.Retry(
+                total=self.RETRIES,
+                backoff_factor=self.RETRY_BACKOFF,
+                status_forcelist=(500, 502, 503, 504)
+            )
+        )
+        self._lock = Lock()
+        self.requests = 0
+
+    def _request(self, url, gzip):
+        """
+        Send GET request & return response with body not read yet.
+        """
+        headers = {'Accept-Encoding': 'gzip'} if gzip else {}
+        with self._lock:
+            self.requests += 1
+        try:
+            response = self._pool.request('GET', url, headers=headers, preload_content=False)
+        except urllib3.exceptions.HTTPError as error:
+            raise DownloadError('Failed to download {}: {}'.format(url, error)) from error
+
+        if response.status >= 400:
+            response.drain_conn()
+            response.release_conn()
+            raise DownloadError('Failed to download {}: HTTP {}'.format(url, response.status))
+        return response
+
+    def get(self, url, gzip=False):
+        """
+        Download *url* & return its content.
+
+        With *gzip*, the server may compress the response, which is decompressed on the fly.
+        """
+        response = self._request(url, gzip)
+        try:
+            return response.read()
+        except urllib3.exceptions.HTTPError as error:
+            response.close()
+            raise DownloadError('Failed to download {}: {}'.format(url, error)) from error
+        finally:
+            response.release_conn()
+
+    def stream(self, url, gzip=False, chunk_size=CHUNK_SIZE):
+        """
+        Download *url* & yield its content in chunks of up to *chunk_size* bytes.
+
+        The connection goes back to the pool once the content is read,
+        it's closed if the generator is closed before that.
+        """
+        response = self._request(url, gzip)
+        complete = False
+        try:
+            for chunk in response.stream(chunk_size):
+                yield chunk
+            complete = True
+        except urllib3.exceptions.HTTPError as error:
+            raise DownloadError('Failed to download {}: {}'.format(url, error)) from error
+        finally:
+            if not complete:
+                response.close()
+            response.release_conn()
+
+    def get_stats(self):
+        """
+        Return download statistics. Connections are counted for hosts that are still pooled.
+        """
+        connections = 0
+        for key in self._pool.pools.keys():
+            try:
+                connections += self._pool.pools[key].num_connections
+            except KeyError:
+                pass
+        return dict(
+            requests=self.requests,
+            connections=connections
+        )
+
+
+download_manager = _DownloadManager()  # pylint: disable=invalid-name
@@ -16,9 +16,14 @@
 """
 A file containing the classes and methods for Google Music Albums
 """
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from threading import Lock
+
+from clay.core.log import logger
 from . import client
 from .track import Track
-from .utils import Source
+from .utils import Source, asynchronous
 
 class Album(object):
     """
@@ -55,10 +60,30 @@ class Album(object):
                                            many=True)
         return self._tracks
 
+    def load_tracks(self, on_progress=None):
+        """
+        Fetch (if needed) and return the tracks of this album.
+
+        *on_progress*, if given, is called with the tracks once they are available.
+        """
+        tracks = self.tracks
+        if on_progress is not None:
+            on_progress(tracks)
+        return tracks
+
+    load_tracks_async = asynchronous(load_tracks)
+
 class AllSongs(Album):
     """
     A model representing all songs by an artist
     """
+    #: Maximum number of albums fetched at the same time.
+    MAX_ALBUM_FETCHES = 4
+
+    # Album fetches run in their own pool, since loads of all songs block
+    # waiting for them while running in the shared one.
+    _album_fetcher = ThreadPoolExecutor(max_workers=MAX_ALBUM_FETCHES)
+
     def __init__(self, artist, albums):
         self._id = 'ALL'
         self._albums = albums
@@ -71,14 +96,60 @@ class AllSongs(Album):
 
     @property
     def tracks(self):
-        # Could this be done faster?
         if self._tracks is None:
-            tracks = []
-            for album in self._albums:
-                tracks += album.tracks
-            self._tracks = tracks
+            return self.load_tracks()
+        return self._tracks
+
+    def load_tracks(self, on_progress=None):
+        """
+        Fetch tracks of all albums concurrently and return them in album order.
+
+        At most :attr:`MAX_ALBUM_FETCHES` albums are fetched at once.
+        *on_progress*, if given, is called with the tracks of albums fetched so far
+        (in album order) every time an album arrives.
+        Albums that fail to load are skipped.
+        """
+        if self._tracks is not None:
+            if on_progress is not None:
+                on_progress(self._tracks)
+            return self._tracks
+
+        album_tracks = [None] * len(self._albums)
+        lock = Lock()
+
+        def album_loaded(index, future):
+            """
+            Called when tracks of one album are fetched.
+            """
+            error = future.exception()
+            tracks = None if error else future.result()
+            if error:
+                logger.error('Failed to load tracks of album {}: {}'.format(
+                    self._albums[index], error
+                ))
+                tracks = []
+            # Progress is reported under the lock, so a later call never shows fewer albums
+            with lock:
+                album_tracks[index] = tracks
+                if on_progress is not None:
+                    on_progress([track for one in album_tracks if one for track in one])
+
+        futures = [self._album_fetcher.submit(album.load_tracks) for album in self._albums]
+        for index, future in enumerate(futures):
+            future.add_done_callback(partial(album_loaded, index))
+        wait(futures)
+
+        # Done callbacks may still be running, so results are taken from futures
+        self._tracks = [
+            track
+            for future in futures
+            if not future.exception()
+            for track in future.result()
+        ]
         return self._tracks
 
+    load_tracks_async = asynchronous(load_tracks)
+
 
 class TopSongs(Album):
     """
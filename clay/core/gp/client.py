@@ -17,16 +17,28 @@
 This file contains the classes and methods for dealing with Google Play Playlists
 """
 from __future__ import print_function
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock, RLock
+import time
+from uuid import UUID
 from gmusicapi.clients import Mobileclient
+from gmusicapi.protocol import mobileclient
 from clay.core import EventHook
 from clay.core.log import logger
 
 from .artist import Artist
-from .track import Track
-from .playlist import Playlist, LikedSongs
+from .track import Track, TrackIndex
+from .sortedviews import SortedViews
+from .playlist import Playlist, LikedSongs, get_library_tracks
 from .station import Station, IFLStation
 from .search import SearchResults
-from .utils import synchronized, asynchronous, Source
+from .snapshot import LibrarySnapshot
+from .metadata import MetadataCache
+from .searchindex import SearchIndex
+from .scheduler import Priority, RequestScheduler
+from .utils import synchronized, keyed_synchronized, asynchronous, coalesced, get_url_expiry, \
+    Source
 
 
 class _GP(object):
@@ -39,9 +51,17 @@ class _GP(object):
     # TODO: Switch to urwid signals for more explicitness?
     caches_invalidated = EventHook()
 
+    #: Cached stream URLs are not used during the last seconds before they expire.
+    STREAM_URL_EXPIRY_MARGIN = 15
+    #: Number of recent search queries whose results are cached.
+    SEARCH_CACHE_SIZE = 32
+    #: Seconds search results are cached for.
+    SEARCH_CACHE_TTL = 10 * 60
+
     def __init__(self):
         # self.is_debug = os.getenv('CLAY_DEBUG')
         self.mobile_client = Mobileclient()
+        self.scheduler = RequestScheduler()
         self.mobile_client._make_call = self._make_call_proxy(
             self.mobile_client._make_call
         )
@@ -49,11 +69,28 @@ class _GP(object):
         #     self.debug_file = open('/tmp/clay-api-log.json', 'w')
         #     self._last_call_index = 0
         self.cached_tracks = None
+        self._track_index = TrackIndex()
+        self._sorted_views = None
+        self._search_index = None
         self.cached_liked_songs = LikedSongs()
         self.cached_playlists = None
         self.cached_stations = None
         self.cached_artists = {}
-        self.cached_albums = {}
+        self._stream_urls = {}
+        self._stream_urls_lock = Lock()
+        self._search_results = OrderedDict()
+        self._search_results_lock = Lock()
+
+        self.snapshot = LibrarySnapshot()
+        self.metadata = MetadataCache()
+        # Held by everything that replaces cached tracks, playlists & stations
+        # or reads the snapshot state, readers don't take it
+        self._library_lock = RLock()
+        self._snapshot_pending = True
+        self._refresh_scheduled = False
+        self._sync_timestamps = dict(tracks=0, playlists=0)
+        # Incremented whenever sync merges changes into the cached library
+        self._sync_generation = 0
 
         self.invalidate_caches()
 
@@ -61,18 +98,21 @@ class _GP(object):
 
     def _make_call_proxy(self, func):
         """
-        Return a function that wraps *fn* and logs args & return values.
+        Return a function that wraps *fn*, runs it through :attr:`scheduler`
+        and logs args & return values.
         """
         def _make_call(protocol, *args, **kwargs):
             """
             Wrapper function.
             """
-            logger.debug('GP::{}(*{}, **{})'.format(
+            priority = self.scheduler.get_priority(protocol.__name__)
+            logger.debug('GP::{}(*{}, **{}) [{}]'.format(
                 protocol.__name__,
                 args,
-                kwargs
+                kwargs,
+                priority.name
             ))
-            result = func(protocol, *args, **kwargs)
+            result = self.scheduler.call(priority, func, protocol, *args, **kwargs)
             # self._last_call_index += 1
             # call_index = self._last_call_index
             # self.debug_file.write(json.dumps([
@@ -88,18 +128,34 @@ class _GP(object):
         """
         Clear cached tracks & playlists & stations.
         """
-        self.cached_tracks = None
-        self.cached_playlists = None
-        self.cached_stations = None
-        self.cached_artist = None
+        with self._library_lock:
+            self.cached_tracks = None
+            self._track_index = TrackIndex()
+            self._sorted_views = None
+            self._search_index = None
+            self.cached_playlists = None
+            self.cached_stations = None
+            self.cached_artist = None
         self.caches_invalidated.fire()
 
     @synchronized
     def login(self, email, password, device_id, **_):
         """
         Log in into Google Play Music.
+
+        Library of the previous account is forgotten, including the sync points.
         """
         self.mobile_client.logout()
+        with self._library_lock:
+            self._snapshot_pending = False
+            self.snapshot.clear()
+            self._sync_timestamps = dict(tracks=0, playlists=0)
+            self.cached_liked_songs.clear()
+            self.cached_artists = {}
+        with self._stream_urls_lock:
+            self._stream_urls = {}
+        with self._search_results_lock:
+            self._search_results.clear()
         self.invalidate_caches()
         # prev_auth_state = self.is_authenticated
         result = self.mobile_client.login(email, password, device_id)
@@ -109,19 +165,30 @@ class _GP(object):
 
     login_async = asynchronous(login)
 
-    @synchronized
+    @coalesced
+    @keyed_synchronized(lambda self, artist_id: artist_id)
     def get_artist_info(self, artist_id):
         """
-        Get the artist info
+        Get the artist info, cached on disk.
         """
-        return self.mobile_client.get_artist_info(artist_id, max_rel_artist=0, max_top_tracks=15)
+        info = self.metadata.get('artists', artist_id)
+        if info is None:
+            info = self.mobile_client.get_artist_info(artist_id, max_rel_artist=0,
+                                                      max_top_tracks=15)
+            self.metadata.put('artists', artist_id, info)
+        return info
 
-    @synchronized
+    @coalesced
+    @keyed_synchronized(lambda self, album_id: album_id)
     def get_album_tracks(self, album_id):
         """
-        Get album tracks
+        Get album tracks, cached on disk.
         """
-        return self.mobile_client.get_album_info(album_id, include_tracks=True)['tracks']
+        tracks = self.metadata.get('albums', album_id)
+        if tracks is None:
+            tracks = self.mobile_client.get_album_info(album_id, include_tracks=True)['tracks']
+            self.metadata.put('albums', album_id, tracks)
+        return tracks
 
     @synchronized
     def add_artist(self, artist_id, name):
@@ -168,102 +235,586 @@ class _GP(object):
         # pylint: disable=protected-access
         return self.mobile_client.session._authtoken
 
-    @synchronized
+    def _get_snapshot(self, section):
+        """
+        Return raw *section* data from the library snapshot or ``None``
+        if the library was already refreshed from Google Play Music.
+
+        Schedules the refresh in background once something is served from the snapshot.
+
+        Must be called with :attr:`_library_lock` held.
+        """
+        if not self._snapshot_pending:
+            return None
+
+        data = self.snapshot.load(section)
+        if data is not None and not self._refresh_scheduled:
+            self._refresh_scheduled = True
+            self._refresh_library_async(callback=self._on_library_refreshed)
+        return data
+
+    def _set_tracks_from_data(self, data):
+        """
+        Construct library tracks from Google Play Music API response,
+        cache and index them.
+
+        Liked songs are rebuilt as tracks are constructed,
+        readers keep getting the previous ones until it's done.
+        """
+        with self.cached_liked_songs.updating():
+            self.cached_liked_songs.clear()
+            tracks = Track.from_data(data, Source.library, True)
+        self._track_index = TrackIndex(tracks)
+        self._sorted_views = None
+        self._search_index = None
+        self.cached_tracks = tracks
+        return tracks
+
+    def _stations_from_data(self, data):
+        """
+        Construct library stations from Google Play Music API response.
+        """
+        stations = Station.from_data(data, True)
+        stations.insert(0, IFLStation())
+        return stations
+
+    def _save_tracks_snapshot(self, data):
+        """
+        Save tracks and artists they refer to into the library snapshot.
+        """
+        self.snapshot.save('tracks', data)
+        self._save_artists_snapshot()
+
+    def _save_artists_snapshot(self):
+        """
+        Save artists tracks refer to into the library snapshot.
+        """
+        self.snapshot.save('artists', [
+            dict(artistId=artist.id, name=artist.name)
+            for artist
+            in list(self.cached_artists.values())
+        ])
+
+    def _update_sync_timestamp(self, section, items):
+        """
+        Remember the latest server-side modification time of *items*,
+        so the next delta sync of *section* asks only for newer changes.
+        """
+        self._sync_timestamps[section] = max(
+            [self._sync_timestamps[section]] + [
+                int(item.get('lastModifiedTimestamp', 0))
+                for item
+                in items
+            ]
+        )
+
+    def _get_sync_point(self, section):
+        """
+        Return :class:`datetime.datetime` of the last sync of *section*
+        or ``None`` if it was never synced.
+        """
+        timestamp = self._sync_timestamps[section]
+        if not timestamp:
+            return None
+        return datetime.fromtimestamp(timestamp / 1e6)
+
+    def _update_playlists_sync_timestamp(self, playlists):
+        """
+        Remember the latest modification time of playlists and their entries.
+        """
+        self._update_sync_timestamp('playlists', playlists)
+        for playlist in playlists:
+            self._update_sync_timestamp('playlists', playlist.get('tracks', []))
+
+    def _refresh_library(self):
+        """
+        Fetch tracks, playlists & stations from Google Play Music,
+        replace the ones served from the library snapshot and update the snapshot.
+
+        If sync merged changes while they were fetched, the fetched data may miss them:
+        sync points are moved back to where they were before the fetch and sync runs again.
+        """
+        with self._library_lock:
+            generation = self._sync_generation
+            sync_timestamps = dict(self._sync_timestamps)
+
+        tracks_data = self.mobile_client.get_all_songs()
+        playlists_data = self.mobile_client.get_all_user_playlist_contents()
+        stations_data = self.mobile_client.get_all_stations()
+
+        with self._library_lock:
+            self._snapshot_pending = False
+            self._set_tracks_from_data(tracks_data)
+            self.cached_playlists = Playlist.from_data(playlists_data, True)
+            self.cached_stations = self._stations_from_data(stations_data)
+            resync = self._sync_generation != generation
+            if resync:
+                self._sync_timestamps = sync_timestamps
+            else:
+                self._update_sync_timestamp('tracks', tracks_data)
+                self._update_playlists_sync_timestamp(playlists_data)
+
+        self._save_tracks_snapshot(tracks_data)
+        self.snapshot.save('playlists', playlists_data)
+        self.snapshot.save('stations', stations_data)
+
+        if resync:
+            self.sync()
+
+    _refresh_library_async = asynchronous(_refresh_library, Priority.background)
+
+    def _on_library_refreshed(self, _, error):
+        """
+        Called once the library is refreshed in background.
+        Notifies listeners that the cached data has changed.
+        """
+        if error:
+            logger.error('Failed to refresh library: %s', str(error))
+            with self._library_lock:
+                self._snapshot_pending = False
+            return
+        self.caches_invalidated.fire()
+
+    @coalesced
     def get_all_tracks(self):
         """
         Cache and return all tracks from "My library".
 
+        Tracks are served from the library snapshot on warm start.
+        Once loaded, the list is returned without locking. It must not be modified:
+        updates replace it with a new one.
+
         Each track will have "id" and "storeId" keys.
         """
+        tracks = self.cached_tracks
+        if tracks:
+            return tracks
+        return self._load_all_tracks()
+
+    get_all_tracks_async = asynchronous(get_all_tracks)
+
+    @synchronized
+    def _load_all_tracks(self):
+        """
+        Load tracks from the library snapshot or Google Play Music
+        unless another thread did it while we waited.
+        """
         if self.cached_tracks:
             return self.cached_tracks
+
+        with self._library_lock:
+            data = self._get_snapshot('tracks')
+            if data is None:
+                self._snapshot_pending = False
+            else:
+                for artist in Artist.from_data(self.snapshot.load('artists') or [], True):
+                    self.cached_artists.setdefault(artist.name.lower(), artist)
+                self._set_tracks_from_data(data)
+                self._update_sync_timestamp('tracks', data)
+                return self.cached_tracks
+
         data = self.mobile_client.get_all_songs()
-        self.cached_tracks = Track.from_data(data, Source.library, True)
+        with self._library_lock:
+            self._set_tracks_from_data(data)
+            self._update_sync_timestamp('tracks', data)
+        self._save_tracks_snapshot(data)
 
         return self.cached_tracks
 
-    get_all_tracks_async = asynchronous(get_all_tracks)
+    def get_sorted_views(self):
+        """
+        Return :class:`.SortedViews` of all tracks from "My library".
 
+        Views are created on first call after the library changes.
+        They are kept only if the library didn't change while they were created.
+        """
+        views = self._sorted_views
+        if views is None:
+            tracks = self.get_all_tracks()
+            views = SortedViews(tracks)
+            with self._library_lock:
+                if self.cached_tracks is tracks:
+                    self._sorted_views = views
+        return views
+
+    get_sorted_views_async = asynchronous(get_sorted_views)
+
+    @coalesced
     def get_stream_url(self, stream_id):
         """
         Returns playable stream URL of track by id.
+
+        URLs are cached until shortly before the expiry time they are signed with.
+        """
+        now = time.time()
+        with self._stream_urls_lock:
+            url, expires = self._stream_urls.get(stream_id, (None, 0))
+        if expires - self.STREAM_URL_EXPIRY_MARGIN > now:
+            return url
+
+        url = self.mobile_client.get_stream_url(stream_id)
+        expires = get_url_expiry(url)
+        if expires is not None:
+            with self._stream_urls_lock:
+                self._stream_urls = {
+                    key: value
+                    for key, value
+                    in self._stream_urls.items()
+                    if value[1] > now
+                }
+                self._stream_urls[stream_id] = (url, expires)
+        return url
+
+    get_stream_url_async = asynchronous(get_stream_url, Priority.playback)
+
+    @coalesced
+    def get_all_user_station_contents(self, **_):
         """
-        return self.mobile_client.get_stream_url(stream_id)
+        Return list of :class:`.Station` instances.
 
-    get_stream_url_async = asynchronous(get_stream_url)
+        Once loaded, the list is returned without locking and must not be modified.
+        """
+        stations = self.cached_stations
+        if stations:
+            return stations
+        return self._load_all_user_station_contents()
+
+    get_all_user_station_contents_async = (  # pylint: disable=invalid-name
+        asynchronous(get_all_user_station_contents)
+    )
 
     @synchronized
-    def get_all_user_station_contents(self, **_):
+    def _load_all_user_station_contents(self):
+        """
+        Load stations from the library snapshot or Google Play Music
+        unless another thread did it while we waited.
         """
-              Return list of :class:`.Station` instances.
-              """
         if self.cached_stations:
             return self.cached_stations
         self.get_all_tracks()
 
-        self.cached_stations = Station.from_data(
-            self.mobile_client.get_all_stations(),
-            True
-        )
-        self.cached_stations.insert(0, IFLStation())
+        with self._library_lock:
+            data = self._get_snapshot('stations')
+            if data is not None:
+                self.cached_stations = self._stations_from_data(data)
+                return self.cached_stations
+
+        data = self.mobile_client.get_all_stations()
+        with self._library_lock:
+            self.cached_stations = self._stations_from_data(data)
+        self.snapshot.save('stations', data)
         return self.cached_stations
 
-    get_all_user_station_contents_async = (  # pylint: disable=invalid-name
-        asynchronous(get_all_user_station_contents)
+    @coalesced
+    def get_all_user_playlist_contents(self, **_):
+        """
+        Return list of :class:`.Playlist` instances.
+
+        Once loaded, playlists are returned without locking.
+        """
+        playlists = self.cached_playlists
+        if playlists:
+            return [self.cached_liked_songs] + playlists
+        return self._load_all_user_playlist_contents()
+
+    get_all_user_playlist_contents_async = (  # pylint: disable=invalid-name
+        asynchronous(get_all_user_playlist_contents)
     )
 
     @synchronized
-    def get_all_user_playlist_contents(self, **_):
+    def _load_all_user_playlist_contents(self):
         """
-        Return list of :class:`.Playlist` instances.
+        Load playlists from the library snapshot or Google Play Music
+        unless another thread did it while we waited.
         """
         if self.cached_playlists:
             return [self.cached_liked_songs] + self.cached_playlists
 
         self.get_all_tracks()
 
-        self.cached_playlists = Playlist.from_data(
-            self.mobile_client.get_all_user_playlist_contents(),
-            True
-        )
+        with self._library_lock:
+            data = self._get_snapshot('playlists')
+            if data is not None:
+                self.cached_playlists = Playlist.from_data(data, True)
+                self._update_playlists_sync_timestamp(data)
+                return [self.cached_liked_songs] + self.cached_playlists
+
+        data = self.mobile_client.get_all_user_playlist_contents()
+        with self._library_lock:
+            self.cached_playlists = Playlist.from_data(data, True)
+            self._update_playlists_sync_timestamp(data)
+        self.snapshot.save('playlists', data)
         return [self.cached_liked_songs] + self.cached_playlists
 
-    get_all_user_playlist_contents_async = (  # pylint: disable=invalid-name
-        asynchronous(get_all_user_playlist_contents)
-    )
+    def _merge_tracks(self, data):
+        """
+        Merge changed songs from Google Play Music API response into
+        the cached tracks. Deleted songs are removed.
+
+        Tracks & index are updated on copies that replace the cached ones once complete,
+        so readers never see a partially merged library.
+        """
+        tracks = list(self.cached_tracks)
+        track_index = self._track_index.copy()
+        search_index = self._search_index
+        indexes = {track.library_id: index for index, track in enumerate(tracks)}
+        deleted = set()
+
+        with self.cached_liked_songs.updating():
+            for one in data:
+                index = indexes.get(UUID(one['id']))
+                if index is not None and tracks[index].rating == 5:
+                    self.cached_liked_songs.remove_liked_song(tracks[index])
+
+                if one.get('deleted', False):
+                    if index is not None:
+                        deleted.add(index)
+                    continue
+
+                track = Track.from_data(one, Source.library)
+                if track is None:
+                    continue
+                if index is None:
+                    indexes[track.library_id] = len(tracks)
+                    tracks.append(track)
+                else:
+                    track_index.remove(tracks[index])
+                    tracks[index] = track
+                    deleted.discard(index)
+                track_index.add(track)
+                if search_index is not None:
+                    search_index.add(str(track.library_id), self._get_search_text(track))
+
+        for index in deleted:
+            track_index.remove(tracks[index])
+            if search_index is not None:
+                search_index.remove(str(tracks[index].library_id))
+        if deleted:
+            tracks = [track for index, track in enumerate(tracks) if index not in deleted]
+
+        self._track_index = track_index
+        self.cached_tracks = tracks
+        self._sorted_views = None
+
+    def _merge_playlists(self, playlists_data, entries_data):
+        """
+        Merge changed playlists and playlist entries from Google Play Music API response
+        into the cached playlists. Deleted playlists & entries are removed.
+
+        The list of playlists is replaced with a new one once complete.
+        """
+        cached_playlists = list(self.cached_playlists)
+        playlists = {playlist.id: playlist for playlist in cached_playlists}
+        library_tracks = get_library_tracks(
+            list(entries_data) + [
+                entry
+                for data in playlists_data
+                for entry in data.get('tracks', [])
+            ]
+        )
+
+        for data in playlists_data:
+            if data.get('deleted', False) or data.get('type') == 'SHARED':
+                playlists.pop(data['id'], None)
+            elif data['id'] in playlists:
+                playlists[data['id']].name = data['name']
+            else:
+                playlists[data['id']] = Playlist.from_data(data, library_tracks=library_tracks)
+                cached_playlists.append(playlists[data['id']])
+
+        entries = {}
+        for entry in entries_data:
+            entries.setdefault(entry['playlistId'], []).append(entry)
+        for playlist_id, playlist_entries in entries.items():
+            if playlist_id in playlists:
+                playlists[playlist_id].merge_entries(playlist_entries, library_tracks)
+
+        self.cached_playlists = [
+            playlist
+            for playlist
+            in cached_playlists
+            if playlist.id in playlists
+        ]
+
+    @synchronized
+    def sync(self):
+        """
+        Fetch songs & playlist entries changed since the last sync
+        and merge them into the cached tracks & playlists.
+
+        Caches that are not loaded yet are left alone, they will be fetched in full.
+        Changes are merged with :attr:`_library_lock` held, so they apply to
+        the latest tracks & playlists even if a library refresh ran meanwhile.
+        Merged changes are saved into the library snapshot as well.
+        """
+        if self.cached_tracks is not None:
+            data = self.mobile_client.get_all_songs(
+                updated_after=self._get_sync_point('tracks')
+            )
+            with self._library_lock:
+                merged = self.cached_tracks is not None
+                if merged:
+                    self._merge_tracks(data)
+                    self._update_sync_timestamp('tracks', data)
+                    self._sync_generation += 1
+            if merged and data:
+                self.snapshot.merge_tracks(data)
+                self._save_artists_snapshot()
+
+        if self.cached_playlists is not None:
+            updated_after = self._get_sync_point('playlists')
+            playlists_data = self.mobile_client.get_all_playlists(updated_after=updated_after)
+            # pylint: disable=protected-access
+            entries_data = self.mobile_client._get_all_items(
+                mobileclient.ListPlaylistEntries,
+                incremental=False,
+                updated_after=updated_after
+            )
+            with self._library_lock:
+                merged = self.cached_playlists is not None
+                if merged:
+                    self._merge_playlists(playlists_data, entries_data)
+                    self._update_sync_timestamp('playlists', playlists_data)
+                    self._update_sync_timestamp('playlists', entries_data)
+                    self._sync_generation += 1
+            if merged and (playlists_data or entries_data):
+                self.snapshot.merge_playlists(playlists_data, entries_data)
+
+        self.caches_invalidated.fire()
 
     def get_cached_tracks_map(self):
         """
         Return a dictionary of tracks where keys are strings with track IDs
         and values are :class:`.Track` instances.
         """
-        return {track.id: track for track in self.cached_tracks}
+        return self._track_index.get_map()
 
     def get_track_by_id(self, any_id):
         """
         Return track by id or store_id.
         """
-        for track in self.cached_tracks:
-            if any_id in (track.library_id, track.store_id, track.playlist_item_id):
-                return track
-        return None
+        return self._track_index.get(any_id)
+
+    def get_tracks_by_library_ids(self, library_ids):
+        """
+        Return dict that maps library IDs (strings, as in playlist entries)
+        to library tracks. Unknown & malformed IDs are left out.
+
+        Each distinct ID is resolved once against the same track index.
+        """
+        track_index = self._track_index
+        tracks = {}
+        for library_id in set(library_ids):
+            try:
+                track = track_index.get(UUID(library_id))
+            except ValueError:
+                continue
+            if track is not None:
+                tracks[library_id] = track
+        return tracks
+
+    @staticmethod
+    def _get_search_text(track):
+        """
+        Return text *track* is found by in the library search index.
+        """
+        return u'{} {} {}'.format(track.artist, track.title, track.album_name)
+
+    @synchronized
+    def get_search_index(self):
+        """
+        Return :class:`.SearchIndex` of library tracks by artist, title & album,
+        where document IDs are library IDs of tracks as strings.
+
+        The index is restored from the library snapshot if it was built for
+        the same tracks, otherwise it's built and saved there. Sync keeps it up to date.
+        The index is kept only if the library didn't change while it was built.
+        """
+        if self._search_index is not None:
+            return self._search_index
+
+        tracks = self.get_all_tracks()
+        with self._library_lock:
+            tracks = self.cached_tracks or tracks
+            timestamp = self._sync_timestamps['tracks']
+        data = self.snapshot.load('search_index')
+        if data is not None and data['timestamp'] == timestamp and data['count'] == len(tracks):
+            index = SearchIndex.from_data(data['index'])
+        else:
+            index = SearchIndex()
+            for track in tracks:
+                index.add(str(track.library_id), self._get_search_text(track))
+            self.snapshot.save('search_index', dict(
+                timestamp=timestamp, count=len(tracks), index=index.to_data()
+            ))
+
+        with self._library_lock:
+            if self.cached_tracks is tracks:
+                self._search_index = index
+        return index
+
+    get_search_index_async = asynchronous(get_search_index)
+
+    def search_library(self, query):
+        """
+        Return library tracks where every word of *query* starts a word
+        of the track artist, title or album.
+        """
+        return [
+            track
+            for track
+            in (
+                self._track_index.get(UUID(doc_id))
+                for doc_id
+                in self.get_search_index().search(query)
+            )
+            if track is not None
+        ]
+
+    search_library_async = asynchronous(search_library)
 
     def search(self, query):
         """
         Find tracks and return an instance of :class:`.SearchResults`.
+
+        Results are cached for :attr:`SEARCH_CACHE_TTL` seconds by query
+        with case and whitespace normalized. Least recently used queries
+        are dropped once there are more than :attr:`SEARCH_CACHE_SIZE` of them.
         """
-        results = self.mobile_client.search(query)
-        return SearchResults.from_data(results)
+        query = ' '.join(query.casefold().split())
+        now = time.time()
+        with self._search_results_lock:
+            results, expires = self._search_results.get(query, (None, 0))
+            if expires > now:
+                self._search_results.move_to_end(query)
+                return results
+
+        results = self._search(query)
+
+        with self._search_results_lock:
+            self._search_results[query] = (results, now + self.SEARCH_CACHE_TTL)
+            self._search_results.move_to_end(query)
+            while len(self._search_results) > self.SEARCH_CACHE_SIZE:
+                self._search_results.popitem(last=False)
+        return results
 
     search_async = asynchronous(search)
 
+    @coalesced
+    def _search(self, query):
+        """
+        Search Google Play Music for normalized *query*.
+        """
+        results = self.mobile_client.search(query)
+        return SearchResults.from_data(results)
+
     def add_to_my_library(self, track):
         """
         Add a track to my library.
         """
         result = self.mobile_client.add_store_tracks(track.id)
         if result:
-            self.invalidate_caches()
+            self.sync()
         return result
 
     def remove_from_my_library(self, track):
@@ -272,7 +823,7 @@ class _GP(object):
         """
         result = self.mobile_client.delete_songs(track.id)
         if result:
-            self.invalidate_caches()
+            self.sync()
         return result
 
     @property
@@ -0,0 +1,145 @@
+# This file is part of Clay.
+# Copyright (C) 2018, Andrew Dunbai & Clay Contributors
+#
+# Clay is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Clay is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Clay. If not, see <https://www.gnu.org/licenses/>.
+"""
+This file contains the on-disk cache of artist & album metadata
+"""
+from collections import OrderedDict
+from hashlib import sha1
+from threading import Lock
+import gzip
+import json
+import os
+import time
+
+from clay.core.settings import settings_manager
+from clay.core.log import logger
+
+
+class MetadataCache(object):
+    """
+    On-disk cache of Google Play Music metadata responses, such as artist info
+    and album tracks, grouped by kind.
+
+    Each entry is a gzipped JSON file in the directory of its kind and expires
+    after a TTL set when it is stored. Once a kind holds more than
+    :attr:`MAX_ENTRIES` entries, the least recently used ones are removed.
+    """
+    VERSION = 1
+    #: Default TTL in seconds of each kind.
+    TTLS = dict(
+        artists=24 * 60 * 60,
+        albums=7 * 24 * 60 * 60
+    )
+    MAX_ENTRIES = 500
+
+    def __init__(self):
+        self._dir = os.path.join(settings_manager.get_cache_dir(), 'metadata')
+        self._lock = Lock()
+        # kind -> OrderedDict of entry filenames, ordered from least to most recently used
+        self._entries = {}
+
+    @staticmethod
+    def _get_filename(key):
+        """
+        Return filename of entry *key*.
+        """
+        return sha1(key.encode('utf-8')).hexdigest() + '.json.gz'
+
+    def _get_entries(self, kind):
+        """
+        Return entries of *kind*, scanning its directory on first use.
+        Must be called with the lock held.
+        """
+        entries = self._entries.get(kind)
+        if entries is None:
+            try:
+                files = sorted(
+                    (entry.stat().st_mtime, entry.name)
+                    for entry
+                    in os.scandir(os.path.join(self._dir, kind))
+                    if entry.name.endswith('.json.gz')
+                )
+            except FileNotFoundError:
+                files = []
+            entries = self._entries[kind] = OrderedDict((name, None) for _, name in files)
+        return entries
+
+    def _remove(self, kind, filename):
+        """
+        Remove entry file. Must be called with the lock held.
+        """
+        self._get_entries(kind).pop(filename, None)
+        try:
+            os.remove(os.path.join(self._dir, kind, filename))
+        except FileNotFoundError:
+            pass
+
+    def get(self, kind, key):
+        """
+        Return data stored under *key* or ``None`` if it is missing or expired.
+        """
+        filename = self._get_filename(key)
+        path = os.path.join(self._dir, kind, filename)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as entry_file:
+                entry = json.load(entry_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as error:
+            logger.warn('Failed to load cached {} "{}": {}'.format(kind, key, error))
+            entry = None
+
+        with self._lock:
+            if entry is None or entry.get('version') != self.VERSION or \
+               entry['key'] != key or entry['expires'] <= time.time():
+                self._remove(kind, filename)
+                return None
+
+            self._get_entries(kind)[filename] = None
+            self._get_entries(kind).move_to_end(filename)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+        return entry['data']
+
+    def put(self, kind, key, data, ttl=None):
+        """
+        Store *data* under *key* for *ttl* seconds (default is TTL of *kind*).
+        """
+        if ttl is None:
+            ttl = self.TTLS[kind]
+        filename = self._get_filename(key)
+        path = os.path.join(self._dir, kind, filename)
+
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as entry_file:
+                    json.dump(dict(
+                        version=self.VERSION, key=key, expires=time.time() + ttl, data=data
+                    ), entry_file)
+                os.replace(path + '.tmp', path)
+            except OSError as error:
+                logger.error('Failed to cache {} "{}": {}'.format(kind, key, error))
+                return
+
+            entries = self._get_entries(kind)
+            entries[filename] = None
+            entries.move_to_end(filename)
+            while len(entries) > self.MAX_ENTRIES:
+                self._remove(kind, next(iter(entries)))
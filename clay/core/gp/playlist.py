@@ -16,17 +16,53 @@
 """
 This file contains the classes and methods for dealing with Google Play Playlists
 """
+from bisect import bisect_left
+from contextlib import contextmanager
+from itertools import count
+from operator import itemgetter
+from threading import Lock
+
+from clay.core.cache import cache_manager
+from clay.core.log import logger
 from .utils import Source
 from .track import Track
+from . import client
+
+
+def get_library_tracks(entries):
+    """
+    Return dict that maps track IDs of playlist *entries* without track data
+    to library tracks, resolved in one batch.
+
+    Track IDs missing from the library are logged in a single line.
+    """
+    track_ids = [
+        entry['trackId']
+        for entry
+        in entries
+        if 'track' not in entry and not entry.get('deleted', False)
+    ]
+    if not track_ids:
+        return {}
+
+    tracks = client.gp.get_tracks_by_library_ids(track_ids)
+    missing = sorted(set(track_ids) - set(tracks))
+    if missing:
+        logger.warn('Failed to find {} playlist tracks in library: {}'.format(
+            len(missing), ', '.join(missing)
+        ))
+    return tracks
 
 class Playlist(object):
     """
     Model that represents remotely stored (Google Play Music) playlist.
     """
-    def __init__(self, playlist_id, name, tracks):
+    def __init__(self, playlist_id, name, entries):
         self._id = playlist_id
         self.name = name
-        self.tracks = tracks
+        self._entries = entries
+        self.tracks = []
+        self._sort_entries()
 
     def __str__(self):
         return "{} ({})".format(self.name, len(self.tracks))
@@ -38,20 +74,69 @@ class Playlist(object):
         """
         return self._id
 
+    def _sort_entries(self):
+        """
+        Replace :attr:`tracks` with playlist entries ordered by their position.
+        """
+        self.tracks = [
+            track
+            for _, track
+            in sorted(self._entries.values(), key=itemgetter(0))
+        ]
+
+    def merge_entries(self, data, library_tracks=None):
+        """
+        Merge changed playlist entries from Google Play Music API response
+        into this playlist. Deleted entries are removed.
+
+        *library_tracks* is the output of :func:`get_library_tracks` for *data*,
+        it is computed if not given.
+
+        Entries are merged into a copy, so readers of :attr:`tracks`
+        keep a consistent list while this runs.
+        """
+        if library_tracks is None:
+            library_tracks = get_library_tracks(data)
+
+        entries = dict(self._entries)
+        for entry in data:
+            if entry.get('deleted', False):
+                entries.pop(entry['id'], None)
+                continue
+
+            if 'track' in entry:
+                track = Track.from_data(entry, Source.playlist)
+            else:
+                track = library_tracks.get(entry['trackId'])
+            if track is not None:
+                entries[entry['id']] = (entry['absolutePosition'], track)
+
+        self._entries = entries
+        self._sort_entries()
+
     @classmethod
-    def from_data(cls, data, many=False):
+    def from_data(cls, data, many=False, library_tracks=None):
         """
         Construct and return one or many :class:`.Playlist` instances
         from Google Play Music API response.
+
+        With *many*, library tracks of all playlists are resolved in one batch.
         """
         if many:
-            return [cls.from_data(one) for one in data]
+            library_tracks = get_library_tracks(
+                entry
+                for one in data
+                for entry in one.get('tracks', [])
+            )
+            return [cls.from_data(one, library_tracks=library_tracks) for one in data]
 
-        return Playlist(
+        playlist = Playlist(
             playlist_id=data['id'],
             name=data['name'],
-            tracks=Track.from_data(data['tracks'], Source.playlist, many=True)
+            entries={}
         )
+        playlist.merge_entries(data.get('tracks', []), library_tracks)
+        return playlist
 
 
 class LikedSongs(object):
@@ -59,12 +144,25 @@ class LikedSongs(object):
     A local model that represents the songs that a user liked and displays them as a faux playlist.
 
     This mirrors the "liked songs" generated playlist feature of the Google Play Music apps.
+
+    Songs are kept ordered from the most to the least recently liked:
+    each song is inserted at its position with bisect and is found by its ID
+    for removal, so a song is never listed twice.
+
+    :attr:`tracks` returns a copy published on first read after a change,
+    so readers never see the list change under them.
+    Changes made inside :meth:`updating` are published once it completes.
     """
     def __init__(self):
         self._id = None  # pylint: disable=invalid-name
         self.name = "Liked Songs"
+        self._lock = Lock()
+        self._counter = count()
+        self._entries = {}  # song key -> (sort key, track)
+        self._keys = []  # sort keys, in the same order as tracks
         self._tracks = []
-        self._sorted = False
+        self._published = []
+        self._updating = 0
 
     def __str__(self):
         return "{} ({})".format(self.name, len(self._tracks))
@@ -72,26 +170,104 @@ class LikedSongs(object):
     @property
     def tracks(self):
         """
-        Get a sorted list of liked tracks.
-        """
-        if self._sorted:
-            tracks = self._tracks
-        else:
-            self._tracks.sort(key=lambda k: k.original_data.get('lastRatingChangeTimestamp', '0'),
-                              reverse=True)
-            self._sorted = True
-            tracks = self._tracks
+        Get a list of liked tracks, most recently liked first.
 
+        The list must not be modified.
+        """
+        tracks = self._published
+        if tracks is None:
+            with self._lock:
+                if self._published is None:
+                    self._published = list(self._tracks)
+                tracks = self._published
         return tracks
 
+    @contextmanager
+    def updating(self):
+        """
+        Keep publishing the current list until the block completes,
+        e.g. while the list is cleared and liked songs are added back.
+        """
+        with self._lock:
+            if self._published is None:
+                self._published = list(self._tracks)
+            self._updating += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._updating -= 1
+                self._changed()
+
+    def _changed(self):
+        """
+        Publish a new copy on the next read, unless inside :meth:`updating`.
+        Must be called with the lock held.
+        """
+        if not self._updating:
+            self._published = None
+
+    @staticmethod
+    def _get_key(song):
+        """
+        Return key that identifies *song* whatever source it comes from.
+        """
+        return song.store_id or song.id
+
+    def _remove(self, key):
+        """
+        Remove song by *key* and return it, ``None`` if there is no such song.
+        Must be called with the lock held.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+
+        sort_key, song = entry
+        position = bisect_left(self._keys, sort_key)
+        del self._keys[position]
+        del self._tracks[position]
+        self._changed()
+        return song
+
     def add_liked_song(self, song):
         """
-        Add a liked song to the list.
+        Add a liked song to the list and protect it from cache eviction.
+        A song that is already in the list is moved to its new position.
         """
-        self._tracks.insert(0, song)
+        key = self._get_key(song)
+        # Newer likes go first, songs liked at the same time are ordered by insertion.
+        sort_key = (-song.last_rating_change, -next(self._counter))
+        with self._lock:
+            old_song = self._remove(key)
+            position = bisect_left(self._keys, sort_key)
+            self._keys.insert(position, sort_key)
+            self._tracks.insert(position, song)
+            self._entries[key] = (sort_key, song)
+            self._changed()
+
+        if old_song is not None and old_song.filename != song.filename:
+            cache_manager.unpin(old_song.filename)
+        cache_manager.pin(song.filename)
 
     def remove_liked_song(self, song):
         """
-        Remove a liked song from the list
+        Remove a liked song from the list, if it is there.
+        """
+        with self._lock:
+            old_song = self._remove(self._get_key(song))
+        if old_song is not None:
+            cache_manager.unpin(old_song.filename)
+
+    def clear(self):
         """
-        self._tracks.remove(song)
+        Remove all liked songs from the list.
+        """
+        with self._lock:
+            tracks = self._tracks
+            self._entries = {}
+            self._keys = []
+            self._tracks = []
+            self._changed()
+        for song in tracks:
+            cache_manager.unpin(song.filename)
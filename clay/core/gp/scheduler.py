@@ -0,0 +1,191 @@
+# This file is part of Clay.
+# Copyright (C) 2018, Andrew Dunbai & Clay Contributors
+#
+# Clay is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Clay is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Clay. If not, see <https://www.gnu.org/licenses/>.
+"""
+This file contains the scheduler of Google Play Music requests
+"""
+from contextlib import contextmanager
+from enum import IntEnum
+from itertools import count
+from threading import Condition, local
+import re
+import time
+
+from clay.core.log import logger
+
+STATUS_RE = re.compile(r'\b(\d{3}) (?:Client|Server) Error')
+
+
+class Priority(IntEnum):
+    """
+    Priority lane of a Google Play Music request. Lower values start first.
+    """
+    playback = 0
+    browse = 1
+    background = 2
+
+
+_context = local()  # pylint: disable=invalid-name
+
+
+def get_request_priority():
+    """
+    Return priority set for requests of the current thread, ``None`` if there is none.
+    """
+    return getattr(_context, 'priority', None)
+
+
+@contextmanager
+def request_priority(priority):
+    """
+    Make requests of the current thread use *priority* instead of the default one
+    of their call. ``None`` restores the default.
+    """
+    previous = get_request_priority()
+    _context.priority = priority
+    try:
+        yield
+    finally:
+        _context.priority = previous
+
+
+def get_status_code(error):
+    """
+    Return HTTP status code of failed request *error*, ``None`` if it is unknown.
+    """
+    status_code = getattr(getattr(error.__context__, 'response', None), 'status_code', None)
+    if status_code is None:
+        match = STATUS_RE.search(str(error))
+        if match:
+            status_code = int(match.group(1))
+    return status_code
+
+
+class RequestScheduler(object):
+    """
+    Runs Google Play Music requests in order of priority.
+
+    Waiting requests start by lane (see :class:`.Priority`) and then by arrival,
+    so playback requests always start before others that wait.
+    Each lane has a limit of requests that run at once, and all lanes share a rate limit.
+    When the server responds with 429 or 5xx, new requests are held back
+    for an exponentially growing delay until a request succeeds.
+    """
+    LANE_LIMITS = {
+        Priority.playback: 4,
+        Priority.browse: 4,
+        Priority.background: 2
+    }
+    #: Default priorities of calls by name, others are :attr:`.Priority.browse`.
+    #: Background work sets its priority explicitly, see :func:`.request_priority`.
+    CALL_PRIORITIES = dict(
+        GetStreamUrl=Priority.playback,
+        GetStationTrackStreamUrl=Priority.playback,
+        GetPodcastEpisodeStreamUrl=Priority.playback
+    )
+    #: Requests per second, with bursts of up to :attr:`BURST` requests.
+    RATE = 10.0
+    BURST = 10
+    BACKOFF_MIN = 1.0
+    BACKOFF_MAX = 60.0
+
+    def __init__(self):
+        self._condition = Condition()
+        self._counter = count()
+        self._waiting = []  # (priority, arrival number) of waiting requests
+        self._running = {priority: 0 for priority in Priority}
+        self._tokens = float(self.BURST)
+        self._refilled_at = time.monotonic()
+        self._backoff = 0.0
+        self._backoff_until = 0.0
+
+    def get_priority(self, call_name):
+        """
+        Return priority of call *call_name* made from the current thread.
+        """
+        priority = get_request_priority()
+        if priority is None:
+            priority = self.CALL_PRIORITIES.get(call_name, Priority.browse)
+        return priority
+
+    def _get_delay(self, request, now):
+        """
+        Return number of seconds *request* must wait for before it starts (``0`` if it can
+        start now) or ``None`` if it must wait for other requests to start or finish.
+        Must be called with the lock held.
+        """
+        startable = [
+            waiting
+            for waiting
+            in self._waiting
+            if self._running[waiting[0]] < self.LANE_LIMITS[waiting[0]]
+        ]
+        if not startable or min(startable) != request:
+            return None
+
+        self._tokens = min(self.BURST, self._tokens + (now - self._refilled_at) * self.RATE)
+        self._refilled_at = now
+        return max(0, self._backoff_until - now, (1 - self._tokens) / self.RATE)
+
+    def _acquire(self, priority):
+        """
+        Wait until a request with *priority* can start and count it as running.
+        """
+        request = (priority, next(self._counter))
+        with self._condition:
+            self._waiting.append(request)
+            try:
+                while True:
+                    delay = self._get_delay(request, time.monotonic())
+                    if delay == 0:
+                        break
+                    self._condition.wait(delay)
+            finally:
+                self._waiting.remove(request)
+                self._condition.notify_all()
+
+            self._tokens -= 1
+            self._running[priority] += 1
+
+    def _release(self, priority, error=None):
+        """
+        Count request with *priority* as finished with *error* (if any)
+        and adjust the backoff.
+        """
+        with self._condition:
+            self._running[priority] -= 1
+            status_code = get_status_code(error) if error is not None else None
+            if status_code is not None and (status_code == 429 or status_code >= 500):
+                self._backoff = min(self.BACKOFF_MAX, max(self.BACKOFF_MIN, self._backoff * 2))
+                self._backoff_until = time.monotonic() + self._backoff
+                logger.warn('Google Play Music responded with {}, backing off for {}s'.format(
+                    status_code, self._backoff
+                ))
+            elif error is None:
+                self._backoff = 0.0
+            self._condition.notify_all()
+
+    def call(self, priority, func, *args, **kwargs):
+        """
+        Run request *func* with *args* & *kwargs* once its turn comes, return its result.
+        """
+        self._acquire(priority)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as error:
+            self._release(priority, error)
+            raise
+        self._release(priority)
+        return result
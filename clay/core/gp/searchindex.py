@@ -0,0 +1,219 @@
+# This file is part of Clay.
+# Copyright (C) 2018, Andrew Dunbai & Clay Contributors
+#
+# Clay is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Clay is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Clay. If not, see <https://www.gnu.org/licenses/>.
+"""
+This file contains the local full text search index
+"""
+from bisect import bisect_left
+from threading import Lock
+import re
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """
+    Return *text* prepared for case-insensitive matching.
+    """
+    return text.casefold()
+
+
+def get_trigrams(text):
+    """
+    Return set of all 3-character substrings of *text*.
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex(object):
+    """
+    In-memory index of short texts (e.g. "artist title album") identified by document IDs.
+
+    Supports two kinds of queries:
+
+    - :meth:`search` matches documents that contain a word starting with
+      each of the query words (token index with prefix lookups).
+    - :meth:`find` matches documents that contain the query as a substring
+      (trigram index, candidates are verified against the text).
+
+    Results keep the order in which documents were added.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._doc_ids = []  # document number -> document ID, None once removed
+        self._texts = []  # document number -> normalized text
+        self._numbers = {}  # document ID -> document number
+        self._tokens = {}  # token -> set of document numbers
+        self._trigrams = {}  # trigram -> set of document numbers
+        self._sorted_tokens = None
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def _index(self, number, text):
+        """
+        Add postings of document *number*. Must be called with the lock held.
+        """
+        for token in set(TOKEN_RE.findall(text)):
+            postings = self._tokens.get(token)
+            if postings is None:
+                postings = self._tokens[token] = set()
+                self._sorted_tokens = None
+            postings.add(number)
+        for trigram in get_trigrams(text):
+            self._trigrams.setdefault(trigram, set()).add(number)
+
+    def _unindex(self, number, text):
+        """
+        Remove postings of document *number*. Must be called with the lock held.
+        """
+        for token in set(TOKEN_RE.findall(text)):
+            postings = self._tokens[token]
+            postings.discard(number)
+            if not postings:
+                del self._tokens[token]
+                self._sorted_tokens = None
+        for trigram in get_trigrams(text):
+            postings = self._trigrams[trigram]
+            postings.discard(number)
+            if not postings:
+                del self._trigrams[trigram]
+
+    def add(self, doc_id, text):
+        """
+        Add or replace document *doc_id*.
+        """
+        text = normalize(text)
+        with self._lock:
+            number = self._numbers.get(doc_id)
+            if number is None:
+                number = self._numbers[doc_id] = len(self._doc_ids)
+                self._doc_ids.append(doc_id)
+                self._texts.append(text)
+            else:
+                self._unindex(number, self._texts[number])
+                self._texts[number] = text
+            self._index(number, text)
+
+    def remove(self, doc_id):
+        """
+        Remove document *doc_id* if it is present.
+        """
+        with self._lock:
+            number = self._numbers.pop(doc_id, None)
+            if number is None:
+                return
+            self._unindex(number, self._texts[number])
+            self._doc_ids[number] = None
+            self._texts[number] = ''
+
+    def _get_doc_ids(self, numbers):
+        """
+        Return IDs of documents *numbers* in insertion order.
+        """
+        return [self._doc_ids[number] for number in sorted(numbers)]
+
+    def _get_prefix_postings(self, prefix):
+        """
+        Return document numbers that have a token starting with *prefix*.
+        Must be called with the lock held.
+        """
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._tokens)
+        tokens = self._sorted_tokens
+
+        numbers = set()
+        position = bisect_left(tokens, prefix)
+        while position < len(tokens) and tokens[position].startswith(prefix):
+            numbers |= self._tokens[tokens[position]]
+            position += 1
+        return numbers
+
+    def search(self, query):
+        """
+        Return IDs of documents where every word of *query* is a prefix of some word.
+        """
+        prefixes = sorted(set(TOKEN_RE.findall(normalize(query))), key=len, reverse=True)
+        if not prefixes:
+            return []
+
+        with self._lock:
+            numbers = None
+            for prefix in prefixes:
+                postings = self._get_prefix_postings(prefix)
+                numbers = postings if numbers is None else numbers & postings
+                if not numbers:
+                    return []
+            return self._get_doc_ids(numbers)
+
+    def find(self, query):
+        """
+        Return IDs of documents that contain *query* as a substring.
+        """
+        query = normalize(query)
+        with self._lock:
+            if len(query) < 3:
+                return [
+                    doc_id
+                    for doc_id, text
+                    in zip(self._doc_ids, self._texts)
+                    if doc_id is not None and query in text
+                ]
+
+            numbers = None
+            for postings in sorted(
+                    (self._trigrams.get(trigram, set()) for trigram in get_trigrams(query)),
+                    key=len
+            ):
+                numbers = set(postings) if numbers is None else numbers & postings
+                if not numbers:
+                    return []
+            return self._get_doc_ids(
+                number for number in numbers if query in self._texts[number]
+            )
+
+    def to_data(self):
+        """
+        Return JSON-serializable representation of this index.
+        """
+        with self._lock:
+            return dict(
+                doc_ids=list(self._doc_ids),
+                texts=list(self._texts),
+                tokens={token: list(numbers) for token, numbers in self._tokens.items()},
+                trigrams={trigram: list(numbers) for trigram, numbers in self._trigrams.items()}
+            )
+
+    @classmethod
+    def from_data(cls, data):
+        """
+        Construct index from :meth:`to_data` output.
+        """
+        index = cls()
+        index._doc_ids = data['doc_ids']  # pylint: disable=protected-access
+        index._texts = data['texts']  # pylint: disable=protected-access
+        index._numbers = {  # pylint: disable=protected-access
+            doc_id: number
+            for number, doc_id
+            in enumerate(data['doc_ids'])
+            if doc_id is not None
+        }
+        index._tokens = {  # pylint: disable=protected-access
+            token: set(numbers) for token, numbers in data['tokens'].items()
+        }
+        index._trigrams = {  # pylint: disable=protected-access
+            trigram: set(numbers) for trigram, numbers in data['trigrams'].items()
+        }
+        return index
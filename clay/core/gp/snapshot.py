@@ -0,0 +1,157 @@
+# This file is part of Clay.
+# Copyright (C) 2018, Andrew Dunbai & Clay Contributors
+#
+# Clay is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Clay is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Clay. If not, see <https://www.gnu.org/licenses/>.
+"""
+This file contains the on-disk snapshot of the Google Play Music library
+"""
+from threading import Lock
+import gzip
+import json
+import os
+
+from clay.core.settings import settings_manager
+from clay.core.log import logger
+
+
+class LibrarySnapshot(object):
+    """
+    Versioned on-disk copy of the raw library data as returned by Google Play Music.
+
+    Each section (tracks, playlists, stations, artists, search index) is stored in a separate
+    gzipped JSON file in the cache directory, so a section can be loaded or
+    replaced without touching the rest.
+
+    Changes from delta sync are merged into the stored data with :meth:`merge_tracks`
+    and :meth:`merge_playlists`.
+    """
+    VERSION = 1
+
+    def __init__(self):
+        self._dir = os.path.join(settings_manager.get_cache_dir(), 'library')
+        # Serializes writes, so a merge never overwrites data saved while it ran
+        self._lock = Lock()
+
+    def _get_path(self, section):
+        """
+        Return path of the file that holds *section*.
+        """
+        return os.path.join(self._dir, section + '.json.gz')
+
+    def load(self, section):
+        """
+        Return raw data of *section* or ``None`` if it is missing, unreadable
+        or was written by a different snapshot version.
+        """
+        try:
+            with gzip.open(self._get_path(section), 'rt', encoding='utf-8') as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as error:
+            logger.warn('Failed to load library snapshot "%s": %s', section, str(error))
+            return None
+
+        if snapshot.get('version') != self.VERSION:
+            logger.debug('Discarding outdated library snapshot "%s"', section)
+            return None
+
+        return snapshot['data']
+
+    def save(self, section, data):
+        """
+        Replace *section* with *data*.
+
+        The file is written next to the old one and renamed over it,
+        so readers never see a partially written snapshot.
+        """
+        with self._lock:
+            self._save(section, data)
+
+    def _save(self, section, data):
+        """
+        Replace *section* with *data*. Must be called with the lock held.
+        """
+        path = self._get_path(section)
+        os.makedirs(self._dir, exist_ok=True)
+        try:
+            with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as snapshot_file:
+                json.dump(dict(version=self.VERSION, data=data), snapshot_file)
+            os.replace(path + '.tmp', path)
+        except OSError as error:
+            logger.error('Failed to save library snapshot "%s": %s', section, str(error))
+
+    def merge_tracks(self, data):
+        """
+        Merge changed songs from Google Play Music API response into tracks.
+        Deleted songs are removed. Nothing is done if there are no tracks yet.
+        """
+        with self._lock:
+            snapshot = self.load('tracks')
+            if snapshot is None:
+                return
+
+            songs = {song['id']: song for song in snapshot}
+            for one in data:
+                if one.get('deleted', False):
+                    songs.pop(one['id'], None)
+                else:
+                    songs[one['id']] = one
+            self._save('tracks', list(songs.values()))
+
+    def merge_playlists(self, playlists_data, entries_data):
+        """
+        Merge changed playlists and playlist entries from Google Play Music API response
+        into playlists. Deleted playlists & entries are removed.
+        Nothing is done if there are no playlists yet.
+        """
+        with self._lock:
+            snapshot = self.load('playlists')
+            if snapshot is None:
+                return
+
+            playlists = {playlist['id']: playlist for playlist in snapshot}
+            for data in playlists_data:
+                if data.get('deleted', False) or data.get('type') == 'SHARED':
+                    playlists.pop(data['id'], None)
+                else:
+                    old_playlist = playlists.get(data['id'], {})
+                    playlists[data['id']] = dict(data, tracks=old_playlist.get('tracks', []))
+
+            entries = {}
+            for entry in entries_data:
+                entries.setdefault(entry['playlistId'], []).append(entry)
+            for playlist_id, playlist_entries in entries.items():
+                playlist = playlists.get(playlist_id)
+                if playlist is None:
+                    continue
+                tracks = {entry['id']: entry for entry in playlist['tracks']}
+                for entry in playlist_entries:
+                    if entry.get('deleted', False):
+                        tracks.pop(entry['id'], None)
+                    else:
+                        tracks[entry['id']] = entry
+                playlist['tracks'] = list(tracks.values())
+
+            self._save('playlists', list(playlists.values()))
+
+    def clear(self):
+        """
+        Remove all sections.
+        """
+        for section in ('tracks', 'playlists', 'stations', 'artists', 'search_index'):
+            try:
+                os.remove(self._get_path(section))
+            except FileNotFoundError:
+                pass
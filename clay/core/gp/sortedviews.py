@@ -0,0 +1,45 @@
+# This file is part of Clay.
+# Copyright (C) 2018, Andrew Dunbai & Clay Contributors
+#
+# Clay is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Clay is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Clay. If not, see <https://www.gnu.org/licenses/>.
+"""
+This file contains the sorted views of the library tracks
+"""
+from operator import attrgetter
+
+
+class SortedViews(object):
+    """
+    Library tracks sorted by their fields.
+
+    Each sort order is computed on first use and kept until the library changes,
+    so switching back to the library page doesn't sort it again.
+    """
+    def __init__(self, tracks):
+        self.tracks = tracks
+        self._sorted = {}
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def sort_by(self, column, reverse=False):
+        """
+        Return a new list of tracks sorted by field *column*. Sort is stable.
+        """
+        key = (column, reverse)
+        tracks = self._sorted.get(key)
+        if tracks is None:
+            tracks = self._sorted[key] = sorted(self.tracks, key=attrgetter(column),
+                                                reverse=reverse)
+        return list(tracks)
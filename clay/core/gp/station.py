@@ -17,6 +17,7 @@
 Contains the classes and functions for Google Music stations
 """
 from . import track, client
+from .scheduler import Priority
 from .utils import asynchronous, Source
 
 class Station(object):
@@ -53,6 +54,23 @@ class Station(object):
 
     load_tracks_async = asynchronous(load_tracks)
 
+    def load_more_tracks(self, recently_played_ids=()):
+        """
+        Fetch another batch of tracks for this station, append them to it & return them.
+
+        *recently_played_ids* are store IDs of tracks played from this station,
+        the server avoids returning them again.
+        """
+        data = client.gp.mobile_client.get_station_tracks(
+            self.id, self.FETCH_LENGTH, list(recently_played_ids)
+        )
+        tracks = track.Track.from_data(data, Source.station, many=True)
+        self._tracks = self._tracks + tracks
+        self._tracks_loaded = True
+        return tracks
+
+    load_more_tracks_async = asynchronous(load_more_tracks, Priority.background)
+
     def get_tracks(self):
         """
         Return a list of tracks in this station.
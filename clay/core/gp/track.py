@@ -16,26 +16,33 @@
 """
 This file contains the classes and functions for gmusic track
 """
-try:
-    from PIL import Image
-except ImportError:
-    Image = None
-
-from urllib.request import urlopen
-from io import BytesIO
+from concurrent.futures import Future
+from sys import intern
+from time import time
 from uuid import UUID
 from hashlib import sha1
 
-from clay.core.settings import settings_manager
+from clay.core.art import art_manager
+from clay.core.cache import cache_manager
 from clay.core.log import logger
 from . import station, client
-from .utils import synchronized, asynchronous, Type, Source
+from .scheduler import Priority
+from .utils import keyed_synchronized, asynchronous, Type, Source
 
 
 class Track(object):
     """
     Model that represents single track from Google Play Music.
+
+    Only the fields Clay uses are kept and repeated strings are interned,
+    since a library can hold tens of thousands of tracks.
     """
+    __slots__ = (
+        'store_id', 'playlist_item_id', 'library_id', 'title', 'artist', 'album_artist',
+        'album_name', 'album_url', 'duration', 'rating', 'explicit_rating',
+        'last_rating_change', 'source', 'cached_url', 'artist_art_url'
+    )
+
     def __init__(self, source, data):
         # In playlist items and user uploaded songs the storeIds are missing so
         self.store_id = (data['storeId'] if 'storeId' in data else data.get('id'))
@@ -47,16 +54,9 @@ class Track(object):
             data = data['track']
             self.store_id = data['storeId']
 
-        artist_art_ref = next(iter(sorted(
-            [
-                ref
-                for ref
-                in data.get('artistArtRef', [])
-            ],
-            key=lambda x: x['aspectRatio']
-        )), None)
-        self.title = data['title']
-        self.artist = data['artist']
+        self.title = intern(data['title'])
+        self.artist = intern(data['artist'])
+        self.album_artist = None
 
         if 'artistId' in data and data['artistId'] != "" and source == Source.library:
             if 'albumArtist' not in data or data['albumArtist'] == "":
@@ -74,26 +74,29 @@ class Track(object):
         #self.artist = client.gp.add_artist(data['artistId'][0])
         self.duration = int(data['durationMillis'])
         self.rating = (int(data['rating']) if 'rating' in data else 0)
+        self.last_rating_change = int(data.get('lastRatingChangeTimestamp', 0))
         self.source = source
         self.cached_url = None
-        self.artist_art_url = None
-        self.artist_art_filename = None
-        if artist_art_ref is not None:
-            self.artist_art_url = artist_art_ref['url']
-            self.artist_art_filename = sha1(
-                self.artist_art_url.encode('utf-8')
-            ).hexdigest() + u'.jpg'
+        artist_art_ref = min(data.get('artistArtRef', []), key=lambda x: x['aspectRatio'],
+                             default=None)
+        self.artist_art_url = (artist_art_ref['url'] if artist_art_ref is not None else None)
         self.explicit_rating = (int(data['explicitType'] if 'explicitType' in data else 0))
 
         if self.rating == 5:
             client.gp.cached_liked_songs.add_liked_song(self)
 
         # User uploaded songs miss a store_id
-        self.album_name = data['album']
+        self.album_name = intern(data['album'])
         self.album_url = (data['albumArtRef'][0]['url'] if 'albumArtRef' in data else "")
 
-        self.original_data = data
-
+    @property
+    def artist_art_filename(self):
+        """
+        Return filename of cached artist art, None if this track doesn't have any.
+        """
+        if self.artist_art_url is None:
+            return None
+        return sha1(self.artist_art_url.encode('utf-8')).hexdigest() + u'.jpg'
 
     @property
     def id(self):  # pylint: disable=invalid-name
@@ -104,6 +107,15 @@ class Track(object):
             return self.library_id
         return self.store_id
 
+    @property
+    def stream_id(self):
+        """
+        Return ID that is used to request stream URL for this track.
+        """
+        if client.gp.is_subscribed:
+            return self.store_id
+        return str(self.library_id)
+
     @property
     def filename(self):
         """
@@ -170,38 +182,39 @@ class Track(object):
             self.cached_url = url
             callback(url, error, self)
 
-        if client.gp.is_subscribed:
-            track_id = self.store_id
-        else:
-            track_id = str(self.library_id)
-        client.gp.get_stream_url_async(track_id, callback=on_get_url)
+        client.gp.get_stream_url_async(self.stream_id, callback=on_get_url)
 
-    @synchronized
-    def get_artist_art_filename(self):
+    def prefetch_url(self):
         """
-        Return artist art filename, None if this track doesn't have any.
-        Downloads if necessary.
+        Request playable stream URL for this track in background,
+        so that following :meth:`get_url` call is served from cache.
         """
-        if self.artist_art_url is None:
-            return None
+        client.gp.get_stream_url_async(self.stream_id, priority=Priority.background)
 
-        if not settings_manager.get_is_file_cached(self.artist_art_filename):
-            response = urlopen(self.artist_art_url)
-            data = response.read()
-            if Image:
-                image = Image.open(BytesIO(data))
-                image.thumbnail((128, 128))
-                out = BytesIO()
-                image = image.convert('RGB')
-                image.save(out, format='JPEG')
-                data = out.getvalue()
-            settings_manager.save_file_to_cache(self.artist_art_filename, data)
-
-        return settings_manager.get_cached_file_path(self.artist_art_filename)
+    def get_is_artist_art_cached(self):
+        """
+        Return ``True`` if artist art of this track is already in cache.
+        """
+        return self.artist_art_url is not None and \
+            cache_manager.get_is_file_cached(self.artist_art_filename)
 
-    # get_artist_arg_filename_async = asynchronous(get_artist_art_filename)
+    def get_artist_art_filename_async(self, callback=None):
+        """
+        Fetch artist art into cache in background.
 
-    @synchronized
+        Returns :class:`concurrent.futures.Future` of the art filename, None if
+        this track doesn't have any. *callback* receives filename and error.
+        """
+        if self.artist_art_url is None:
+            future = Future()
+            future.set_result(None)
+            if callback is not None:
+                callback(None, None)
+            return future
+        return art_manager.get_art_async(self.artist_art_url, self.artist_art_filename,
+                                         callback=callback)
+
+    @keyed_synchronized(lambda self: self.store_id)
     def create_station(self):
         """
         Creates a new station from this :class:`.Track`.
@@ -213,9 +226,9 @@ class Track(object):
             name=station_name,
             track_id=self.store_id
         )
-        station = station.Station(station_id, station_name)
-        station.load_tracks()
-        return station
+        new_station = station.Station(station_id, station_name)
+        new_station.load_tracks()
+        return new_station
 
     create_station_async = asynchronous(create_station)
 
@@ -238,13 +251,14 @@ class Track(object):
     def rate_song(self, rating):
         """
         Rate the song either 0 (no thumb), 1 (down thumb) or 5 (up thumb).
-        gp.mobile_client.rate_songs(self.original_data, rating)
         """
-        self.original_data['rating'] = rating
         self.rating = rating
+        self.last_rating_change = int(time() * 1e6)
 
         if rating == 5:
             client.gp.cached_liked_songs.add_liked_song(self)
+        else:
+            client.gp.cached_liked_songs.remove_liked_song(self)
 
     def __repr__(self):
         return u'<Track "{} - {}" from {}>'.format(
@@ -252,3 +266,101 @@ class Track(object):
             self.title,
             self.source
         )
+
+
+class TrackIndex(object):
+    """
+    Index of tracks by every ID they can be looked up with:
+    library ID, store ID and playlist item ID.
+
+    If an ID is shared by several tracks (e.g. an upload and a store track),
+    the track that was added first is returned, and the next one once it is removed.
+    """
+    def __init__(self, tracks=()):
+        self._tracks = {}  # any ID -> tuple of tracks that have it, in order of addition
+        self._tracks_by_id = {}  # track.id -> track
+        self._claims_by_id = {}  # track.id -> tuple of tracks that have it, in order of addition
+        for track in tracks:
+            self.add(track)
+
+    @staticmethod
+    def _get_ids(track):
+        """
+        Return all IDs of *track*.
+        """
+        return [
+            track_id
+            for track_id
+            in (track.library_id, track.store_id, track.playlist_item_id)
+            if track_id is not None
+        ]
+
+    @staticmethod
+    def _claim(claims, key, track):
+        """
+        Add *track* to tracks that have *key* in *claims*.
+        Tuples are replaced rather than modified, so copies of the index can share them.
+        """
+        tracks = claims.get(key, ())
+        if track not in tracks:
+            claims[key] = tracks + (track,)
+
+    @staticmethod
+    def _release(claims, key, track):
+        """
+        Remove *track* from tracks that have *key* in *claims*.
+        Return the track that has *key* now, ``None`` if there is none.
+        """
+        tracks = tuple(other for other in claims.get(key, ()) if other is not track)
+        if tracks:
+            claims[key] = tracks
+            return tracks[0]
+        claims.pop(key, None)
+        return None
+
+    def add(self, track):
+        """
+        Add *track* to index.
+        """
+        for track_id in self._get_ids(track):
+            self._claim(self._tracks, track_id, track)
+        self._claim(self._claims_by_id, track.id, track)
+        self._tracks_by_id.setdefault(track.id, track)
+
+    def remove(self, track):
+        """
+        Remove *track* from index.
+        """
+        for track_id in self._get_ids(track):
+            self._release(self._tracks, track_id, track)
+        other = self._release(self._claims_by_id, track.id, track)
+        if other is None:
+            self._tracks_by_id.pop(track.id, None)
+        else:
+            self._tracks_by_id[track.id] = other
+
+    def copy(self):
+        """
+        Return a new index with the same tracks.
+        """
+        index = TrackIndex()
+        index._tracks = dict(self._tracks)  # pylint: disable=protected-access
+        index._tracks_by_id = dict(self._tracks_by_id)  # pylint: disable=protected-access
+        index._claims_by_id = dict(self._claims_by_id)  # pylint: disable=protected-access
+        return index
+
+    def get(self, any_id):
+        """
+        Return track by any of its IDs, ``None`` if there is no such track.
+        """
+        tracks = self._tracks.get(any_id)
+        return tracks[0] if tracks else None
+
+    def get_map(self):
+        """
+        Return a dictionary where keys are track IDs (see :attr:`.Track.id`)
+        and values are :class:`.Track` instances.
+
+        The dictionary is maintained by the index and must not be modified.
+        """
+        return self._tracks_by_id
@@ -16,8 +16,24 @@
 """
 This file contains classes and functions generally useful for Google Play Music
 """
+from concurrent.futures import Future, ThreadPoolExecutor
 from enum import Enum
-from threading import Thread, Lock
+from threading import Lock, RLock
+from urllib.parse import urlparse, parse_qs
+
+from clay.core.log import logger
+from .scheduler import Priority, get_request_priority, request_priority
+
+#: Maximum number of functions decorated with :func:`asynchronous` running at the same time.
+#: This also caps the number of concurrent Google Play Music requests.
+MAX_WORKERS = 8
+#: Maximum number of playback calls running at the same time, see :func:`asynchronous`.
+MAX_PLAYBACK_WORKERS = 2
+
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)  # pylint: disable=invalid-name
+playback_executor = ThreadPoolExecutor(  # pylint: disable=invalid-name
+    max_workers=MAX_PLAYBACK_WORKERS
+)
 
 
 class Type(Enum):
@@ -40,38 +56,85 @@ class Source(Enum):
     album = 'album'
 
 
-def asynchronous(func):
+def get_url_expiry(url):
+    """
+    Return expiry time (seconds since epoch) embedded into a signed Google URL
+    as "expire" query parameter or ``None`` if there is none.
+    """
+    try:
+        return int(parse_qs(urlparse(url).query)['expire'][0])
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+def asynchronous(func, priority=None):
     """
     Decorates a function to become asynchronous.
 
-    Once called, runs original function in a new Thread.
+    Once called, runs original function in the shared :data:`executor`
+    and returns a :class:`concurrent.futures.Future` of its result.
+    Calls are queued when all workers are busy.
 
-    Must be called with a 'callback' argument that will be called
-    once thread with original function finishes. Receives two args:
+    Can be called with a 'callback' argument that will be called
+    once the original function finishes. Receives two args:
     result and error.
 
     - "result" contains function return value or None if there was an exception.
     - "error" contains None or Exception if there was one.
+
+    Google Play Music requests made by the function use *priority*
+    (see :class:`.RequestScheduler`), which can be overridden with a 'priority' argument.
+    Playback calls run in :data:`playback_executor`, so they never wait for other calls.
     """
     def wrapper(*args, **kwargs):
         """
         Inner function.
         """
-        callback = kwargs.pop('callback')
+        callback = kwargs.pop('callback', None)
         extra = kwargs.pop('extra', dict())
+        call_priority = kwargs.pop('priority', priority)
+
+        def notify(result, error):
+            """
+            Call the callback, if any. Errors raised by it are logged,
+            so they do not replace the result of the future.
+            """
+            if callback is None:
+                return
+            try:
+                callback(result, error, **extra)
+            except Exception as callback_error:  # pylint: disable=broad-except
+                logger.error('Callback of %s failed: %s', func.__name__, repr(callback_error))
+
+        def on_shared_done(future):
+            """
+            Called when a coalesced call this one joined finishes.
+            """
+            error = future.exception()
+            notify(None if error else future.result(), error)
+
+        if hasattr(func, 'get_in_flight'):
+            future = func.get_in_flight(call_priority, *args, **kwargs)
+            if future is not None:
+                future.add_done_callback(on_shared_done)
+                return future
 
         def process():
             """
-            Thread body.
+            Worker body.
             """
             try:
-                result = func(*args, **kwargs)
+                with request_priority(call_priority):
+                    result = func(*args, **kwargs)
             except Exception as error:
-                callback(None, error, **extra)
-            else:
-                callback(result, None, **extra)
+                notify(None, error)
+                raise
+            notify(result, None)
+            return result
 
-        Thread(target=process).start()
+        if call_priority == Priority.playback:
+            return playback_executor.submit(process)
+        return executor.submit(process)
 
     return wrapper
 
@@ -97,3 +160,101 @@ def synchronized(func):
             lock.release()
 
     return wrapper
+
+
+#: Number of locks shared by all functions decorated with :func:`keyed_synchronized`.
+LOCK_STRIPES = 64
+
+_lock_stripes = [RLock() for _ in range(LOCK_STRIPES)]  # pylint: disable=invalid-name
+
+
+def keyed_synchronized(get_key):
+    """
+    Decorates a function to become thread-safe per key: calls with the same key
+    returned by *get_key* (called with the same arguments) never run at the same time,
+    while calls with different keys usually run in parallel.
+
+    Keys are mapped onto a fixed table of :data:`LOCK_STRIPES` locks,
+    so unrelated keys occasionally share a lock.
+    """
+    def decorator(func):
+        """
+        Inner decorator.
+        """
+        def wrapper(*args, **kwargs):
+            """
+            Inner function.
+            """
+            lock = _lock_stripes[hash((func.__qualname__, get_key(*args, **kwargs))) % LOCK_STRIPES]
+            with lock:
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def coalesced(func):
+    """
+    Decorates a function to coalesce concurrent calls with the same arguments:
+    while a call is in flight, identical calls wait for it and share its result
+    (or exception) instead of running the function again.
+
+    Calls with unhashable arguments are never coalesced. Neither are calls
+    made with different request priorities (see :func:`.request_priority`), so that
+    a playback call never waits for a background one.
+
+    :func:`asynchronous` joins in-flight calls without occupying a worker.
+    """
+    lock = Lock()
+    in_flight = {}
+
+    def get_key(priority, args, kwargs):
+        """
+        Return hashable key for call priority & arguments or ``None``.
+        """
+        key = (priority, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get_in_flight(priority, *args, **kwargs):
+        """
+        Return :class:`concurrent.futures.Future` of an identical in-flight call
+        made with *priority* or ``None``.
+        """
+        key = get_key(priority, args, kwargs)
+        if key is None:
+            return None
+        with lock:
+            return in_flight.get(key)
+
+    def wrapper(*args, **kwargs):
+        """
+        Inner function.
+        """
+        key = get_key(get_request_priority(), args, kwargs)
+        if key is None:
+            return func(*args, **kwargs)
+
+        with lock:
+            future = in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = in_flight[key] = Future()
+
+        if is_owner:
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as error:  # pylint: disable=broad-except
+                future.set_exception(error)
+            finally:
+                with lock:
+                    del in_flight[key]
+
+        return future.result()
+
+    wrapper.get_in_flight = get_in_flight
+    return wrapper
@@ -43,7 +43,6 @@ class _Settings(object):
     def __init__(self):
         self._config = {}
         self._default_config = {}
-        self._cached_files = set()
 
         self._config_dir = None
         self._config_file_path = None
@@ -51,7 +50,6 @@ class _Settings(object):
 
         self._ensure_directories()
         self._load_config()
-        self._load_cache()
 
     def _ensure_directories(self):
         """
@@ -95,13 +93,6 @@ class _Settings(object):
         else:
             self.colours_config = yaml.load(pkg_resources.resource_string(__name__, "colours.yaml"))
 
-
-    def _load_cache(self):
-        """
-        Load cached files.
-        """
-        self._cached_files = set(os.listdir(self._cache_dir))
-
     def _commit_edits(self, config):
         """
         Write config to file.
@@ -121,7 +112,7 @@ class _Settings(object):
         section = self.get_section(*sections)
 
         try:
-            return section.get(key)
+            return section[key]
         except (KeyError, TypeError):
             section = self.get_default_config_section(*sections)
             return section.get(key)
@@ -169,30 +160,11 @@ class _Settings(object):
         """
         return _SettingsEditor(self._config, self._commit_edits)
 
-    def get_cached_file_path(self, filename):
-        """
-        Get full path to cached file.
-        """
-        path = os.path.join(self._cache_dir, filename)
-        if os.path.exists(path):
-            return path
-        return None
-
-    def get_is_file_cached(self, filename):
-        """
-        Return ``True`` if *filename* is present in cache.
-        """
-        return filename in self._cached_files
-
-    def save_file_to_cache(self, filename, content):
+    def get_cache_dir(self):
         """
-        Save content into file in cache.
+        Return path to cache dir.
         """
-        path = os.path.join(self._cache_dir, filename)
-        with open(path, 'wb') as cachefile:
-            cachefile.write(content)
-        self._cached_files.add(filename)
-        return path
+        return self._cache_dir
 
 
 settings_manager = _Settings()  # pylint: disable=invalid-name
@@ -3,17 +3,15 @@ An abstract class for playback
 
 Copyright (c) 2018, Valentijn van de Beek
 """
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha1
 from random import randint
+from threading import Lock
 import json
-import os
 
-try:  # Python 3.x
-    from urllib.request import urlopen
-except ImportError:  # Python 2.x
-    from urllib2 import urlopen
 
-
-from clay.core import meta, settings_manager, logger, EventHook, osd_manager, mpris2
+from clay.core import meta, settings_manager, cache_manager, download_manager, logger, EventHook, \
+    osd_manager, mpris2
 
 class _Queue(object):
     """
@@ -33,17 +31,22 @@ class _Queue(object):
         self.tracks = []
         self._played_tracks = []
         self.current_track_index = None
+        self._next_random_index = None
+        self.station = None
 
-    def load(self, tracks, current_track_index=None):
+    def load(self, tracks, current_track_index=None, station=None):
         """
         Load list of tracks into queue.
 
         *current_track_index* can be either ``None`` or ``int`` (zero-indexed).
+        *station* is :class:`clay.core.gp.Station` the tracks come from, if any.
         """
         self.tracks = tracks[:]
+        self.station = station
         if (current_track_index is None) and self.tracks:
             current_track_index = 0
         self.current_track_index = current_track_index
+        self._next_random_index = None
 
     def append(self, track):
         """
@@ -62,6 +65,7 @@ class _Queue(object):
 
         index = self.tracks.index(track)
         self.tracks.remove(track)
+        self._next_random_index = None
         if self.current_track_index is None:
             return
         if index < self.current_track_index:
@@ -76,6 +80,36 @@ class _Queue(object):
 
         return self.tracks[self.current_track_index]
 
+    def _get_next_index(self, force=False):
+        """
+        Return index of the track :meth:`next` would advance to.
+        In random mode the index is picked once and kept until :meth:`next` is called.
+        """
+        if self.current_track_index is None:
+            return 0
+
+        if self.repeat_one and not force:
+            return self.current_track_index
+
+        if self.random:
+            if self._next_random_index is None:
+                self._next_random_index = randint(0, len(self.tracks) - 1)
+            return self._next_random_index
+
+        index = self.current_track_index + 1
+        if index >= len(self.tracks):
+            index = 0
+        return index
+
+    def peek_next(self):
+        """
+        Return the track :meth:`next` will advance to once the current track ends
+        (i.e. without *force*) or ``None`` if queue is empty.
+        """
+        if not self.tracks:
+            return None
+        return self.tracks[self._get_next_index()]
+
     def next(self, force=False):
         """
         Advance to the next track and return it.
@@ -87,23 +121,14 @@ class _Queue(object):
         Manual track switching calls this method with ``force=True`` while
         :class:`.Player` end-of-track event will call it with ``force=False``.
         """
-        if self.current_track_index is None:
-            if not self.tracks:
-                return None
-            self.current_track_index = self.tracks[0]
-        else:
-            self._played_tracks.append(self.current_track_index)
-
-        if self.repeat_one and not force:
-            return self.get_current_track()
-
-        if self.random:
-            self.current_track_index = randint(0, len(self.tracks) - 1)
-            return self.get_current_track()
+        if not self.tracks:
+            return None
 
-        self.current_track_index += 1
-        if (self.current_track_index + 1) >= len(self.tracks):
-            self.current_track_index = 0
+        index = self._get_next_index(force)
+        if self.current_track_index is not None:
+            self._played_tracks.append(self.current_track_index)
+        self.current_track_index = index
+        self._next_random_index = None
 
         return self.get_current_track()
 
@@ -127,12 +152,39 @@ class _Queue(object):
         self.current_track_index = self._played_tracks.pop()
         return self.get_current_track()
 
+    def get_upcoming_tracks(self, count):
+        """
+        Return up to *count* tracks that follow the current one.
+
+        Returns an empty list in random mode since next tracks are not known in advance.
+        """
+        if self.current_track_index is None or self.random:
+            return []
+        start = self.current_track_index + 1
+        return self.tracks[start:start + count]
+
     def get_tracks(self):
         """
         Return current queue, i.e. a list of :class:`Track` instances.
         """
         return self.tracks
 
+    def get_remaining_count(self):
+        """
+        Return number of tracks after the current one.
+        """
+        if self.current_track_index is None:
+            return len(self.tracks)
+        return len(self.tracks) - self.current_track_index - 1
+
+    def get_played_tracks(self):
+        """
+        Return tracks up to & including the current one.
+        """
+        if self.current_track_index is None:
+            return []
+        return self.tracks[:self.current_track_index + 1]
+
 class AbstractPlayer:
     """
     Defines the basic functions used by every player.
@@ -146,8 +198,37 @@ class AbstractPlayer:
     track_appended = EventHook()
     track_removed = EventHook()
 
+    #: Number of upcoming tracks which stream URLs are requested in advance.
+    PREFETCH_COUNT = 2
+    #: Upcoming tracks are prefetched again and the next one is preloaded
+    #: when less than this many seconds are left.
+    PREFETCH_BEFORE_END = 30
+    #: Size of chunks tracks are downloaded in.
+    DOWNLOAD_CHUNK_SIZE = 64 * 1024
+    #: Playback of a track that is being downloaded starts once this many bytes are written.
+    DOWNLOAD_PREBUFFER_SIZE = 256 * 1024
+    #: Maximum number of tracks downloaded at the same time.
+    MAX_DOWNLOADS = 2
+    #: Whether backend can switch to a preloaded track without a gap,
+    #: see :meth:`_enqueue_next`.
+    SUPPORTS_GAPLESS = False
+    #: When a station is played, its next batch of tracks is fetched
+    #: once less than this many tracks are left in queue.
+    STATION_REFILL_THRESHOLD = 5
+    #: Number of recently played tracks the station is told about when refilling.
+    STATION_RECENTLY_PLAYED_COUNT = 50
+
     def __init__(self):
         self._create_station_notification = None
+        self._prefetched_before_end = False
+        self._preloaded_track = None
+        self._refilling_station = None
+        self._loading = False
+        # filename -> state of the track download in flight, see _download_track
+        self._downloads = {}
+        self._downloads_lock = Lock()
+        # Downloads run in their own pool, so they never hold workers of stream URL requests
+        self._downloader = ThreadPoolExecutor(max_workers=self.MAX_DOWNLOADS)
         self.queue = _Queue()
 
         # Add notification actions that we are going to use.
@@ -184,13 +265,15 @@ class AbstractPlayer:
         with open('/tmp/clay.json', 'w') as statefile:
             statefile.write(json.dumps(data, indent=4))
 
-    def load_queue(self, data, current_index=None):
+    def load_queue(self, data, current_index=None, station=None):
         """
         Load queue & start playback
 
+        If *station* is given, queue is refilled with its tracks as it runs out.
+
         See :meth:`._Queue.load`
         """
-        self.queue.load(data, current_index)
+        self.queue.load(data, current_index, station)
         self.queue_changed.fire()
         self.play()
 
@@ -203,6 +286,19 @@ class AbstractPlayer:
         """
         self.queue.append(track)
         self.track_appended.fire(track)
+        self._queue_updated()
+
+    def extend_queue(self, tracks):
+        """
+        Append several tracks to queue at once.
+        Fires :attr:`.track_appended` event for each track.
+
+        See :meth:`._Queue.append`
+        """
+        for track in tracks:
+            self.queue.append(track)
+            self.track_appended.fire(track)
+        self._queue_updated()
 
     def remove_from_queue(self, track):
         """
@@ -213,6 +309,7 @@ class AbstractPlayer:
         """
         self.queue.remove(track)
         self.track_removed.fire(track)
+        self._queue_updated()
 
     def create_station_from_track(self, track):
         """
@@ -223,6 +320,15 @@ class AbstractPlayer:
         track.create_station_async(callback=self._create_station_ready)
         #raise NotImplementedError
 
+    def _create_station_ready(self, station, error):
+        """
+        Called when station created from a track is ready. Starts playing it.
+        """
+        if error:
+            logger.error('Failed to create station: {}'.format(error))
+            return
+        self.load_queue(station.get_tracks(), station=station)
+
     @property
     def random(self):
         """
@@ -241,6 +347,7 @@ class AbstractPlayer:
         """
         self.queue.random = value
         self.playback_flags_changed.fire()
+        self._queue_updated()
 
     @property
     def repeat_one(self):
@@ -257,6 +364,7 @@ class AbstractPlayer:
         """
         self.queue.repeat_one = value
         self.playback_flags_changed.fire()
+        self._queue_updated()
 
     def get_queue_tracks(self):
         """
@@ -271,18 +379,319 @@ class AbstractPlayer:
         """
         raise NotImplementedError
 
+    def _prefetch_upcoming(self):
+        """
+        Request stream URLs of the next few tracks in queue in background,
+        so switching to them does not wait for Google Play Music.
+        """
+        self._prefetched_before_end = False
+        for track in self.queue.get_upcoming_tracks(self.PREFETCH_COUNT):
+            if not cache_manager.get_is_file_cached(track.filename):
+                track.prefetch_url()
+        self._refill_station()
+
+    def _refill_station(self):
+        """
+        Fetch the next batch of station tracks in background
+        if queue is playing a station and is about to run out of tracks.
+        """
+        station = self.queue.station
+        if station is None or self._refilling_station is station:
+            return
+        if self.queue.get_remaining_count() >= self.STATION_REFILL_THRESHOLD:
+            return
+
+        self._refilling_station = station
+        recently_played_ids = [
+            track.store_id
+            for track
+            in self.queue.get_played_tracks()[-self.STATION_RECENTLY_PLAYED_COUNT:]
+        ]
+        station.load_more_tracks_async(recently_played_ids, callback=self._station_refilled,
+                                       extra=dict(station=station))
+
+    def _station_refilled(self, tracks, error, station):
+        """
+        Called when the next batch of station tracks is fetched.
+        Appends them to queue if the station is still being played.
+        """
+        if self._refilling_station is station:
+            self._refilling_station = None
+        if error:
+            logger.error('Failed to fetch more station tracks: {}'.format(error))
+            return
+        if self.queue.station is not station:
+            return
+        self.extend_queue(tracks)
+
+    def _prefetch_before_end(self):
+        """
+        Prefetch upcoming tracks once again close to the end of the current one,
+        since the URLs requested when it started may expire by then.
+        """
+        if self._prefetched_before_end or not self.length_seconds:
+            return
+        if self.length_seconds - self.play_progress_seconds > self.PREFETCH_BEFORE_END:
+            return
+        self._prefetch_upcoming()
+        self._prefetched_before_end = True
+        self._preload_next()
+
+    def _preload_next(self):
+        """
+        Resolve the track that follows the current one and hand it to the backend,
+        so it can switch to it without a gap once the current one ends.
+
+        Tracks that are neither cached nor streamable (download mode) are not preloaded.
+        """
+        if not self.SUPPORTS_GAPLESS or self._preloaded_track is not None:
+            return
+
+        track = self.queue.peek_next()
+        if track is None:
+            return
+
+        # The track may never be played, so it's not counted as a cache lookup yet
+        if cache_manager.get_is_file_cached(track.filename):
+            self._preload_ready(cache_manager.get_file_path(track.filename), None, track)
+        elif not settings_manager.get('download_tracks', 'play_settings'):
+            track.get_url(callback=self._preload_ready)
+
+    def _preload_ready(self, url, error, track):
+        """
+        Called once media URL of the track to preload is known.
+        Hands it to the backend unless the queue has changed meanwhile.
+        """
+        if error:
+            logger.error('Failed to preload track %s: %s', track.store_id, str(error))
+            return
+
+        if self._preloaded_track is not None or track is not self.queue.peek_next():
+            return
+
+        self._preloaded_track = track
+        self._enqueue_next(url)
+
+    def _cancel_preload(self):
+        """
+        Forget the preloaded track and remove it from the backend.
+        """
+        if self._preloaded_track is None:
+            return
+        self._preloaded_track = None
+        self._dequeue_next()
+
+    def _queue_updated(self):
+        """
+        Called when queue or playback flags change and the next track may be different.
+        Preloads the next track again if it was preloaded already and is not the next one anymore.
+        """
+        if self._preloaded_track is not None and self._preloaded_track is self.queue.peek_next():
+            return
+        self._cancel_preload()
+        if self._prefetched_before_end:
+            self._preload_next()
+
+    def _preloaded_started(self):
+        """
+        Called by backend once it switches to the preloaded track on its own.
+        Advances queue without restarting playback.
+        """
+        track = self._preloaded_track
+        self._preloaded_track = None
+        if self.queue.next() is not track:
+            self.play()
+            return
+
+        if cache_manager.get_is_file_cached(track.filename):
+            # Count the play from cache and mark the file as recently used
+            cache_manager.get_cached_file_path(track.filename)
+        self._loading = False
+        self.broadcast_state()
+        self.track_changed.fire(track)
+        self._prefetch_upcoming()
+        self._notify_playing(track)
+
+    def _enqueue_next(self, url):
+        """
+        Append media by *url* to the backend playlist after the current one.
+        Backend must call :meth:`_preloaded_started` when it switches to it.
+        """
+        raise NotImplementedError
+
+    def _dequeue_next(self):
+        """
+        Remove media added with :meth:`_enqueue_next` from the backend playlist.
+        """
+        raise NotImplementedError
+
+    def _notify_playing(self, track):
+        """
+        Show OSD notification about *track* being played.
+
+        If artist art is not in cache yet, notification is shown with a placeholder icon
+        and updated once the art is fetched.
+        """
+        if not track.get_is_artist_art_cached():
+            self._show_osd(track, None)
+        # Cached art is shown right away by the callback
+        track.get_artist_art_filename_async(
+            callback=lambda filename, error: self._artist_art_ready(track, filename, error)
+        )
+
+    def _artist_art_ready(self, track, filename, error):
+        """
+        Update OSD notification once artist art of *track* is fetched.
+        """
+        if error:
+            logger.warn('Failed to fetch artist art for {}: {}'.format(track.title, error))
+            return
+        if filename is not None and track is self.get_current_track():
+            self._show_osd(track, filename)
+
+    @staticmethod
+    def _show_osd(track, icon):
+        """
+        Create or update OSD notification for *track* with *icon*.
+        """
+        osd_manager.notify(track.title, "by {}\nfrom {}\n".format(track.artist, track.album_name),
+                           ("media-skip-backward", "media-playback-pause", "media-skip-forward"),
+                           icon)
+
+    def _is_current_file(self, filename):
+        """
+        Return ``True`` if current track is stored as *filename*.
+        """
+        track = self.get_current_track()
+        return track is not None and track.filename == filename
+
     def _download_track(self, url, error, track):
+        """
+        Called once track's media stream URL request completes in download mode.
+
+        Streams the track into a partial file in cache and moves it in place once complete.
+        Playback starts as soon as :attr:`DOWNLOAD_PREBUFFER_SIZE` bytes are written
+        if backend can play partial downloads (see :meth:`_get_partial_media_url`),
+        otherwise once the download completes.
+
+        Only one download of a file runs at a time: if the track is requested again
+        while it is downloading, the running download plays it.
+
+        Downloads run in a dedicated pool and are cancelled once another track
+        becomes current.
+        """
         if error:
             logger.error(
                 "failed to request media URL for track %s: %s",
-                track.original_data,
+                repr(track),
                 str(error)
             )
             return
 
-        response = urlopen(url)
-        path = settings_manager.save_file_to_cache(track.filename, response.read())
-        self._ready_track(path, None, track)
+        filename = track.filename
+        with self._downloads_lock:
+            download = self._downloads.get(filename)
+            running = download is not None
+            if not running:
+                download = self._downloads[filename] = dict(
+                    url=url, prebuffered=False, started=False
+                )
+
+        if not running:
+            self._downloader.submit(self._fetch_track, url, track, download)
+        elif download['prebuffered'] and self._play_partial(download['url'], track):
+            download['started'] = True
+
+    def _cancel_stale_download(self, filename, download):
+        """
+        Forget *download* of *filename* if it's not the current track anymore.
+        Returns ``True`` if the download must stop.
+        """
+        with self._downloads_lock:
+            if self._is_current_file(filename):
+                return False
+            if self._downloads.get(filename) is download:
+                del self._downloads[filename]
+            return True
+
+    def _fetch_track(self, url, track, download):
+        """
+        Download *track* from *url* into cache, see :meth:`_download_track`.
+        Runs in the download pool, so errors are logged here.
+        """
+        filename = track.filename
+        path = None
+        try:
+            path = self._stream_track(url, track, download)
+            if path is not None and not download['started'] and self._is_current_file(filename):
+                self._play_ready(path, None, self.get_current_track())
+        except Exception as error:  # pylint: disable=broad-except
+            logger.error('Failed to download track %s: %s', track.store_id, str(error))
+        finally:
+            with self._downloads_lock:
+                if self._downloads.get(filename) is download:
+                    del self._downloads[filename]
+                # Another download of the same file owns the partial file now
+                if path is None and filename not in self._downloads:
+                    cache_manager.discard_partial_file(filename)
+
+    def _stream_track(self, url, track, download):
+        """
+        Stream *track* from *url* into a partial file & move it into cache once complete.
+        Returns path of the cached file or ``None`` if the download was cancelled.
+        """
+        filename = track.filename
+        checksum = sha1()
+        size = 0
+        chunks = download_manager.stream(url, chunk_size=self.DOWNLOAD_CHUNK_SIZE)
+        try:
+            with open(cache_manager.start_partial_file(filename), 'wb') as part_file:
+                for chunk in chunks:
+                    if self._cancel_stale_download(filename, download):
+                        logger.debug('Download of track %s cancelled', track.store_id)
+                        return None
+                    part_file.write(chunk)
+                    checksum.update(chunk)
+                    size += len(chunk)
+                    if not download['prebuffered'] and size >= self.DOWNLOAD_PREBUFFER_SIZE:
+                        part_file.flush()
+                        download['prebuffered'] = True
+                        if self._play_partial(url, track):
+                            download['started'] = True
+        finally:
+            chunks.close()
+
+        path = cache_manager.commit_partial_file(filename, checksum.hexdigest())
+        logger.debug('Track %s downloaded (%d bytes)', track.store_id, size)
+        return path
+
+    def _play_partial(self, url, track):
+        """
+        Start playback of *track* that is still being downloaded from *url*.
+        Returns ``True`` if playback was started.
+        """
+        # Backends that play partial downloads override it to return a URL
+        media_url = self._get_partial_media_url(  # pylint: disable=assignment-from-none
+            cache_manager.get_partial_file_path(track.filename), url
+        )
+        if media_url is None:
+            return False
+        self._play_ready(media_url, None, track)
+        return True
+
+    def _play_ready(self, url, error, track):
+        """
+        Called once media of *track* is available at *url* (stream URL or local path).
+        If *error* is ``None``, backend starts playing it.
+        """
+        raise NotImplementedError
+
+    def _get_partial_media_url(self, part_path, url):
+        """
+        Return URL the backend should play while the track is being downloaded
+        from *url* into *part_path* or ``None`` to wait for the download to complete.
+        """
+        return None
 
     @property
     def loading(self):
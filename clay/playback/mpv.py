@@ -4,7 +4,7 @@ An implementation of the Clay player using VLC
 Copyright (c) 2018, Clay Contributors
 """
 from ctypes import CFUNCTYPE, c_void_p, c_int, c_char_p
-from clay.core import osd_manager, logger, meta, settings_manager
+from clay.core import logger, meta, settings_manager, cache_manager
 
 import mpv
 from .abstract import AbstractPlayer
@@ -17,14 +17,21 @@ class MPVPlayer(AbstractPlayer):
 
     Singleton.
     """
+    SUPPORTS_GAPLESS = True
 
     def __init__(self):
         self.media_player = mpv.MPV()
+        try:
+            # Open the preloaded track before the current one ends (mpv 0.30+)
+            self.media_player['prefetch-playlist'] = 'yes'
+        except (AttributeError, TypeError, ValueError):
+            pass
 
         self.media_player.observe_property('pause', self._media_state_changed)
         self.media_player.observe_property('stream-open-filename', self._media_state_changed)
         self.media_player.observe_property('stream-pos', self._media_position_changed)
         self.media_player.observe_property('idle-active', self._media_end_reached)
+        self.media_player.observe_property('playlist-pos', self._playlist_pos_changed)
 
         AbstractPlayer.__init__(self)
 
@@ -45,6 +52,17 @@ class MPVPlayer(AbstractPlayer):
         if value:
             self.next()
 
+    def _playlist_pos_changed(self, _, value):
+        """
+        Called when mpv switches to another playlist entry.
+        Notifies the player if that is the preloaded track
+        and drops the finished entry from the mpv playlist.
+        """
+        if self._preloaded_track is None or value is None or value < 1:
+            return
+        self.media_player.playlist_remove(0)
+        self._preloaded_started()
+
     def _media_position_changed(self, *_):
         """
         Called when playback position changes (this happens few times each second.)
@@ -54,6 +72,7 @@ class MPVPlayer(AbstractPlayer):
         self.media_position_changed.fire(
             self.play_progress
         )
+        self._prefetch_before_end()
 
     def _create_station_ready(self, station, error):
         """
@@ -72,7 +91,7 @@ class MPVPlayer(AbstractPlayer):
             )
             return
 
-        self.load_queue(station.get_tracks())
+        self.load_queue(station.get_tracks(), station=station)
         self._create_station_notification.update('Station ready!')
 
     def play(self):
@@ -83,20 +102,19 @@ class MPVPlayer(AbstractPlayer):
         track = self.queue.get_current_track()
         if track is None:
             return
+        self._cancel_preload()
         self._loading = True
         self.broadcast_state()
         self.track_changed.fire(track)
-
-        if settings_manager.get('download_tracks', 'play_settings') or \
-           settings_manager.get_is_file_cached(track.filename):
-            path = settings_manager.get_cached_file_path(track.filename)
-
-            if path is None:
-                logger.debug('Track %s not in cache, downloading...', track.store_id)
-                track.get_url(callback=self._download_track)
-            else:
-                logger.debug('Track %s in cache, playing', track.store_id)
-                self._play_ready(path, None, track)
+        self._prefetch_upcoming()
+
+        path = cache_manager.get_cached_file_path(track.filename)
+        if path is not None:
+            logger.debug('Track %s in cache, playing', track.store_id)
+            self._play_ready(path, None, track)
+        elif settings_manager.get('download_tracks', 'play_settings'):
+            logger.debug('Track %s not in cache, downloading...', track.store_id)
+            track.get_url(callback=self._download_track)
         else:
             logger.debug('Starting to stream %s', track.store_id)
             track.get_url(callback=self._play_ready)
@@ -111,17 +129,37 @@ class MPVPlayer(AbstractPlayer):
             #notification_area.notify('Failed to request media URL: {}'.format(str(error)))
             logger.error(
                 'Failed to request media URL for track %s: %s',
-                track.original_data,
+                repr(track),
                 str(error)
             )
             return
         assert track
 
+        self._preloaded_track = None
         self.media_player.play(url)
+        self._notify_playing(track)
+
+    def _get_partial_media_url(self, part_path, url):
+        """
+        Play the partial file with mpv's "appending" protocol,
+        which keeps reading as the file grows.
+        """
+        return 'appending://' + part_path
+
+    def _enqueue_next(self, url):
+        """
+        Append media by *url* to the mpv playlist after the current one.
+        """
+        self.media_player.playlist_append(url)
 
-        osd_manager.notify(track.title, "by {}\nfrom {}\n".format(track.artist, track.album_name),
-                           ("media-skip-backward", "media-playback-pause", "media-skip-forward"),
-                           track.get_artist_art_filename())
+    def _dequeue_next(self):
+        """
+        Remove media added with :meth:`_enqueue_next` from the mpv playlist.
+        """
+        try:
+            self.media_player.playlist_remove(self.media_player.playlist_pos + 1)
+        except (SystemError, TypeError):
+            pass
 
     @property
     def playing(self):
@@ -4,7 +4,7 @@ An implementation of the Clay player using VLC
 Copyright (c) 2018, Clay Contributors
 """
 from ctypes import CFUNCTYPE, c_void_p, c_int, c_char_p
-from clay.core import osd_manager, logger, meta, settings_manager
+from clay.core import osd_manager, logger, meta, settings_manager, cache_manager
 
 from . import libvlc as vlc
 from .abstract import AbstractPlayer
@@ -27,6 +27,7 @@ class VLCPlayer(AbstractPlayer):
 
     Singleton.
     """
+    SUPPORTS_GAPLESS = True
 
     def __init__(self):
         self.instance = vlc.Instance()
@@ -46,6 +47,15 @@ class VLCPlayer(AbstractPlayer):
         )
 
         self.media_player = self.instance.media_player_new()
+        self.media_list = None
+        self._enqueued_media = None
+
+        self.media_list_player = self.instance.media_list_player_new()
+        self.media_list_player.set_media_player(self.media_player)
+        self.media_list_player.event_manager().event_attach(
+            vlc.EventType.MediaListPlayerNextItemSet,
+            self._media_list_next_item_set
+        )
 
         self.media_player.event_manager().event_attach(
             vlc.EventType.MediaPlayerPlaying,
@@ -94,10 +104,25 @@ class VLCPlayer(AbstractPlayer):
     def _media_end_reached(self, event):
         """
         Called when end of currently played track is reached.
-        Advances to the next track.
+        Advances to the next track unless the media list player
+        is about to switch to the preloaded one.
+        """
+        assert event
+        if self._preloaded_track is None:
+            self.next()
+
+    def _media_list_next_item_set(self, event):
+        """
+        Called when the media list player switches to another media.
+        Notifies the player if that is the preloaded track.
         """
         assert event
-        self.next()
+        media = self.media_player.get_media()
+        if self._enqueued_media is None or media is None:
+            return
+        if media.get_mrl() == self._enqueued_media.get_mrl():
+            self._enqueued_media = None
+            self._preloaded_started()
 
     def _media_position_changed(self, event):
         """
@@ -109,6 +134,7 @@ class VLCPlayer(AbstractPlayer):
         self.media_position_changed.fire(
             self.play_progress
         )
+        self._prefetch_before_end()
 
     def _create_station_ready(self, station, error):
         """
@@ -127,7 +153,7 @@ class VLCPlayer(AbstractPlayer):
             )
             return
 
-        self.load_queue(station.get_tracks())
+        self.load_queue(station.get_tracks(), station=station)
         self._create_station_notification.update('Station ready!')
 
     def play(self):
@@ -138,20 +164,19 @@ class VLCPlayer(AbstractPlayer):
         track = self.queue.get_current_track()
         if track is None:
             return
+        self._cancel_preload()
         self._loading = True
         self.broadcast_state()
         self.track_changed.fire(track)
-
-        if settings_manager.get('download_tracks', 'play_settings') or \
-           settings_manager.get_is_file_cached(track.filename):
-            path = settings_manager.get_cached_file_path(track.filename)
-
-            if path is None:
-                logger.debug('Track %s not in cache, downloading...', track.store_id)
-                track.get_url(callback=self._download_track)
-            else:
-                logger.debug('Track %s in cache, playing', track.store_id)
-                self._play_ready(path, None, track)
+        self._prefetch_upcoming()
+
+        path = cache_manager.get_cached_file_path(track.filename)
+        if path is not None:
+            logger.debug('Track %s in cache, playing', track.store_id)
+            self._play_ready(path, None, track)
+        elif settings_manager.get('download_tracks', 'play_settings'):
+            logger.debug('Track %s not in cache, downloading...', track.store_id)
+            track.get_url(callback=self._download_track)
         else:
             logger.debug('Starting to stream %s', track.store_id)
             track.get_url(callback=self._play_ready)
@@ -166,17 +191,52 @@ class VLCPlayer(AbstractPlayer):
             #notification_area.notify('Failed to request media URL: {}'.format(str(error)))
             logger.error(
                 'Failed to request media URL for track %s: %s',
-                track.original_data,
+                repr(track),
                 str(error)
             )
             return
         assert track
-        media = vlc.Media(url)
-        self.media_player.set_media(media)
-        self.media_player.play()
-        osd_manager.notify(track.title, "by {}\nfrom {}\n".format(track.artist, track.album_name),
-                           ("media-skip-backward", "media-playback-pause", "media-skip-forward"),
-                           track.get_artist_art_filename())
+        self._preloaded_track = None
+        self._enqueued_media = None
+        self.media_list = self.instance.media_list_new([url])
+        self.media_list_player.set_media_list(self.media_list)
+        self.media_list_player.play()
+        self._notify_playing(track)
+
+    def _get_partial_media_url(self, part_path, url):
+        """
+        libVLC stops at the end of a growing file,
+        so stream the track from *url* while it is being downloaded.
+        """
+        return url
+
+    def _enqueue_next(self, url):
+        """
+        Append media by *url* to the media list after the current one.
+        """
+        media = self.instance.media_new(url)
+        self.media_list.lock()
+        try:
+            self.media_list.add_media(media)
+        finally:
+            self.media_list.unlock()
+        self._enqueued_media = media
+
+    def _dequeue_next(self):
+        """
+        Remove media added with :meth:`_enqueue_next` from the media list.
+        """
+        if self._enqueued_media is None:
+            return
+        self.media_list.lock()
+        try:
+            index = self.media_list.index_of_item(self._enqueued_media)
+            if index >= 0:
+                self.media_list.remove_index(index)
+        finally:
+            self.media_list.unlock()
+        self._enqueued_media = None
+
     @property
     def playing(self):
         """
@@ -0,0 +1,24 @@
+"""
+Image thumbnails.
+
+Thumbnails are made in worker processes that import this module,
+so it must not import the rest of Clay.
+"""
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from io import BytesIO
+
+
+def make_thumbnail(data, size):
+    """
+    Return JPEG thumbnail of image *data*.
+    """
+    image = Image.open(BytesIO(data))
+    image.thumbnail(size)
+    out = BytesIO()
+    image = image.convert('RGB')
+    image.save(out, format='JPEG')
+    return out.getvalue()
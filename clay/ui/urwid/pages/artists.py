@@ -5,7 +5,7 @@ import urwid
 
 from .page import AbstractPage, AbstractListItem, AbstractListBox
 from clay.core import gp
-from clay.ui.urwid import SongListBox, hotkey_manager
+from clay.ui.urwid import SongListBox, hotkey_manager, notification_area
 
 class ArtistListBox(AbstractListBox):
     def populate(self, artists):
@@ -55,6 +55,7 @@ class ArtistsPage(urwid.Columns, AbstractPage):
         self.albumlist = AlbumListBox(app)
         self.songlist = SongListBox(app)
         self.songlist.set_placeholder('\n Select an artist')
+        self._album = None
 
         urwid.connect_signal(self.artistlist, 'activate', self.item_activated)
         urwid.connect_signal(self.albumlist, 'activate', self.album_activate)
@@ -68,5 +69,26 @@ class ArtistsPage(urwid.Columns, AbstractPage):
         self.artistlist.populate(gp.cached_artists)
 
     def album_activate(self, album):
-        self.songlist.populate(album.tracks)
+        self._album = album
+        self.songlist.set_placeholder(u'\n \uf01e Loading song list...')
         self.app.redraw()
+        album.load_tracks_async(
+            on_progress=lambda tracks: self.album_tracks_loaded(album, tracks),
+            callback=self.album_load_finished
+        )
+
+    def album_tracks_loaded(self, album, tracks):
+        """
+        Show (possibly partial) list of album tracks unless another album was opened since.
+        """
+        if album is not self._album:
+            return
+        self.songlist.populate(tracks)
+        self.app.redraw()
+
+    def album_load_finished(self, _, error):
+        """
+        Report album tracks that failed to load.
+        """
+        if error:
+            notification_area.notify('Failed to load album: {}'.format(str(error)))
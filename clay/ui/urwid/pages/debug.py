@@ -5,7 +5,7 @@ import urwid
 
 from .page import AbstractPage
 from .. import hotkey_manager, copy  # short for clay.ui.urwid
-from clay.core import logger, gp
+from clay.core import logger, gp, cache_manager, download_manager
 
 
 class DebugItem(urwid.AttrMap):
@@ -72,11 +72,26 @@ class DebugPage(urwid.Pile, AbstractPage):
         """
         Update this widget.
         """
+        stats = cache_manager.get_stats()
+        download_stats = download_manager.get_stats()
         self.debug_data.set_text(
             '- Is authenticated: {}\n'
-            '- Is subscribed: {}'.format(
+            '- Is subscribed: {}\n'
+            '- Cache: {} files, {:.1f} / {} MB, {} pinned\n'
+            '- Cache hits: {}, misses: {} ({:.0%} hit rate), evictions: {}\n'
+            '- Downloads: {} requests over {} connections'.format(
                 gp.is_authenticated,
-                gp.is_subscribed if gp.is_authenticated else None
+                gp.is_subscribed if gp.is_authenticated else None,
+                stats['files'],
+                stats['size'] / 1024 / 1024,
+                stats['limit'] // 1024 // 1024 or 'unlimited',
+                stats['pinned'],
+                stats['hits'],
+                stats['misses'],
+                stats['hit_rate'],
+                stats['evictions'],
+                download_stats['requests'],
+                download_stats['connections']
             )
         )
 
@@ -112,4 +127,4 @@ class DebugPage(urwid.Pile, AbstractPage):
         """
         Notify page that it is activated.
         """
-        pass
+        self.update()
@@ -45,7 +45,7 @@ class LibraryPage(urwid.Columns, AbstractPage):
             self.songlist
         ])
 
-    def on_get_all_songs(self, tracks, error):
+    def on_get_all_songs(self, views, error):
         """
         Called when all library songs are fetched from server.
         Populate song list.
@@ -53,9 +53,18 @@ class LibraryPage(urwid.Columns, AbstractPage):
         if error:
             notification_area.notify('Failed to load my library: {}'.format(str(error)))
             return
-        tracks.sort(key=lambda k: k.original_data['title'])
-        self.songlist.populate(tracks)
+        self.songlist.populate(views.sort_by('title'))
         self.app.redraw()
+        gp.get_search_index_async(callback=self.on_get_search_index)
+
+    def on_get_search_index(self, index, error):
+        """
+        Called when library search index is ready.
+        Filter song list through it.
+        """
+        if error:
+            return
+        self.songlist.search_index = index
 
     def get_all_songs(self, *_):
         """
@@ -64,7 +73,7 @@ class LibraryPage(urwid.Columns, AbstractPage):
         if gp.is_authenticated:
             self.songlist.set_placeholder(u'\n \uf01e Loading song list...')
 
-            gp.get_all_tracks_async(callback=self.on_get_all_songs)
+            gp.get_sorted_views_async(callback=self.on_get_all_songs)
             self.app.redraw()
 
     def activate(self):
@@ -34,7 +34,7 @@ class QueuePage(urwid.Columns, AbstractPage):
         self.app = app
         self.songlist = SongListBox(app)
 
-        self.songlist.populate(player.get_queue_tracks())
+        self.songlist.populate(player.get_queue_tracks(), player.queue.station)
         player.queue_changed += self.queue_changed
         player.track_appended += self.track_appended
         player.track_removed += self.track_removed
@@ -46,9 +46,10 @@ class QueuePage(urwid.Columns, AbstractPage):
     def queue_changed(self):
         """
         Called when player queue is changed.
-        Updates this queue widget.
+        Updates this queue widget, keeping the station it plays so that
+        jumping to another queued track doesn't stop its refill.
         """
-        self.songlist.populate(player.get_queue_tracks())
+        self.songlist.populate(player.get_queue_tracks(), player.queue.station)
 
     def track_appended(self, track):
         """
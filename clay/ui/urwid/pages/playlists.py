@@ -13,6 +13,14 @@ class PlaylistListBox(AbstractListBox):
     """
     def __init__(self, app, icon):
         super(PlaylistListBox, self).__init__(app, icon)
+        gp.caches_invalidated += self.caches_invalidated
+
+    def caches_invalidated(self):
+        """
+        Called when GP caches are invalidated or refreshed.
+        Requests fetching of playlists again.
+        """
+        self.auth_state_changed(gp.is_authenticated)
 
     def auth_state_changed(self, is_auth):
         """
@@ -76,6 +76,10 @@ class SearchPage(urwid.Pile, AbstractPage):
 
         urwid.connect_signal(self.search_box, 'search-requested', self.perform_search)
 
+        self._library_tracks = []
+        self._found_tracks = None
+        self._search_generation = 0
+
         super(SearchPage, self).__init__([
             ('pack', self.search_box),
             ('pack', urwid.Divider(u'\u2500')),
@@ -89,17 +93,54 @@ class SearchPage(urwid.Pile, AbstractPage):
         self.songlist.set_placeholder(u' \U0001F50D Searching for "{}"...'.format(
             query
         ))
-        gp.search_async(query, callback=self.search_finished)
+        self._library_tracks = []
+        self._found_tracks = None
+        # Results of older searches that finish late are ignored
+        self._search_generation += 1
+        extra = dict(generation=self._search_generation)
+        if gp.is_authenticated:
+            gp.search_library_async(query, callback=self.library_search_finished, extra=extra)
+        gp.search_async(query, callback=self.search_finished, extra=extra)
+
+    def library_search_finished(self, tracks, error, generation):
+        """
+        Show matching tracks from "My library" while waiting for search results.
+        """
+        if generation != self._search_generation:
+            return
+        if error:
+            notification_area.notify('Failed to search library: {}'.format(str(error)))
+            return
+        self._library_tracks = tracks
+        self._show_results()
 
-    def search_finished(self, results, error):
+    def search_finished(self, results, error, generation):
         """
         Populate song list with search results.
         """
+        if generation != self._search_generation:
+            return
         if error:
             notification_area.notify('Failed to search: {}'.format(str(error)))
-        else:
-            self.songlist.populate(results.get_tracks())
-            self.app.redraw()
+            return
+        self._found_tracks = results.get_tracks()
+        self._show_results()
+
+    def _show_results(self):
+        """
+        Populate song list with library tracks followed by search results
+        that are not in the library. Search results are ``None`` until they arrive.
+        """
+        if not self._library_tracks and self._found_tracks is None:
+            return
+        store_ids = {track.store_id for track in self._library_tracks}
+        self.songlist.populate(self._library_tracks + [
+            track
+            for track
+            in self._found_tracks or []
+            if track.store_id not in store_ids
+        ])
+        self.app.redraw()
 
     def activate(self):
         pass
@@ -159,6 +159,9 @@ class SettingsPage(urwid.Columns, AbstractPage):
             'Download tracks before playback',
             state=settings_manager.get('download_tracks', 'play_settings') or False
         )
+        self.cache_size = urwid.IntEdit(
+            default=settings_manager.get('cache_size', 'play_settings') or 0
+        )
         self.equalizer = Equalizer()
         super(SettingsPage, self).__init__([urwid.ListBox(urwid.SimpleListWalker([
             urwid.Text('Settings'),
@@ -174,6 +177,9 @@ class SettingsPage(urwid.Columns, AbstractPage):
             urwid.Divider(' '),
             self.download_tracks,
             urwid.Divider(' '),
+            urwid.Text('Cache size in MB (0 for unlimited)'),
+            urwid.AttrWrap(self.cache_size, 'input', 'input_focus'),
+            urwid.Divider(' '),
             urwid.AttrWrap(urwid.Button(
                 'Save', on_press=self.on_save
             ), 'input', 'input_focus'),
@@ -192,6 +198,7 @@ class SettingsPage(urwid.Columns, AbstractPage):
             config['play_settings']['password'] = self.password.edit_text
             config['play_settings']['device_id'] = self.device_id.edit_text
             config['play_settings']['download_tracks'] = self.download_tracks.state
+            config['play_settings']['cache_size'] = self.cache_size.value()
 
         self.app.set_page('MyLibraryPage')
         self.app.log_in()
@@ -14,6 +14,14 @@ class StationListBox(AbstractListBox):
     """
     def __init__(self, app, icon):
         super(StationListBox, self).__init__(app, icon)
+        gp.caches_invalidated += self.caches_invalidated
+
+    def caches_invalidated(self):
+        """
+        Called when GP caches are invalidated or refreshed.
+        Requests fetching of stations again.
+        """
+        self.auth_state_changed(gp.is_authenticated)
 
     def auth_state_changed(self, is_auth):
         """
@@ -84,7 +92,8 @@ class StationsPage(urwid.Columns, AbstractPage):
             notification_area.notify('Failed to get station tracks: {}'.format(str(error)))
 
         self.songlist.populate(
-            station.get_tracks()
+            station.get_tracks(),
+            station
         )
         self.app.redraw()
 
@@ -15,7 +15,7 @@ except ImportError:
     from string import letters as ascii_letters
 import urwid
 
-from clay.core import gp, settings_manager
+from clay.core import gp, settings_manager, cache_manager
 from clay.playback.player import get_player
 
 from .notifications import notification_area
@@ -147,7 +147,7 @@ class SongListItem(urwid.Pile):
             )
         )
 
-        if settings_manager.get_is_file_cached(self.track.filename):
+        if cache_manager.get_is_file_cached(self.track.filename):
             self.line1_right.set_text(u' \u25bc Cached')
         else:
             self.line1_right.set_text(u'')
@@ -421,6 +421,7 @@ class SongListBox(urwid.Frame):
 
         self.current_item = None
         self.tracks = []
+        self.station = None
         self.walker = urwid.SimpleFocusListWalker([])
 
         player.track_changed += self.track_changed
@@ -449,6 +450,8 @@ class SongListBox(urwid.Frame):
         )
 
         self._is_filtering = False
+        self.search_index = None
+        self._items_by_doc_id = None
         self.popup = None
 
         super(SongListBox, self).__init__(
@@ -482,14 +485,33 @@ class SongListBox(urwid.Frame):
     def get_filtered_items(self):
         """
         Get song items that match the search query.
-        """
-        matches = []
-        for songitem in self.walker:
-            if not isinstance(songitem, SongListItem):
-                continue
-            if self.filter_query.lower() in songitem.full_title.lower():
-                matches.append(songitem)
-        return matches
+
+        If :attr:`search_index` (library :class:`.SearchIndex` from :meth:`.GP.get_search_index`)
+        is set, items are looked up there by artist, title & album.
+        Otherwise all song items are scanned.
+        """
+        if self.search_index is None:
+            query = self.filter_query.lower()
+            return [
+                songitem
+                for songitem
+                in self.walker
+                if isinstance(songitem, SongListItem) and query in songitem.full_title.lower()
+            ]
+
+        if self._items_by_doc_id is None:
+            self._items_by_doc_id = {
+                str(songitem.track.library_id): songitem
+                for songitem
+                in self.walker
+                if isinstance(songitem, SongListItem)
+            }
+        items = (
+            self._items_by_doc_id.get(doc_id)
+            for doc_id
+            in self.search_index.find(self.filter_query)
+        )
+        return sorted((item for item in items if item is not None), key=lambda item: item.index)
 
     def end_filtering(self):
         """
@@ -505,6 +527,8 @@ class SongListBox(urwid.Frame):
         Clear list and add one placeholder item.
         """
         self.walker[:] = [urwid.Text(text, align='center')]
+        self.search_index = None
+        self._items_by_doc_id = None
 
     def tracks_to_songlist(self, tracks):
         """
@@ -562,7 +586,7 @@ class SongListBox(urwid.Frame):
         elif self.app.current_page.append:
             self.item_append_requested(songitem)
         else:
-            player.load_queue(self.tracks, songitem.index)
+            player.load_queue(self.tracks, songitem.index, self.station)
 
     @staticmethod
     def item_append_requested(songitem):
@@ -650,11 +674,15 @@ class SongListBox(urwid.Frame):
                 )
         self.app.redraw()
 
-    def populate(self, tracks):
+    def populate(self, tracks, station=None):
         """
         Display a list of :class:`clay.player.Track` instances in this song list.
+
+        *station* is :class:`clay.core.gp.Station` the tracks come from, if any.
         """
         self.tracks = tracks
+        self.station = station
+        self.search_index = None
         self.walker[:], current_index = self.tracks_to_songlist(self.tracks)
         self.update_indexes()
         if current_index is not None:
@@ -691,6 +719,7 @@ class SongListBox(urwid.Frame):
         """
         Update indexes of all song items in this song list.
         """
+        self._items_by_doc_id = None
         for i, songlistitem in enumerate(self.walker):
             songlistitem.set_index(i)
 
@@ -14,6 +14,7 @@ setup(
     url='https://github.com/and3rson/clay',
     install_requires=[
         'gmusicapi',
+        'urllib3>=1.25',
         'PyYAML',
         'urwid',
         'codename'